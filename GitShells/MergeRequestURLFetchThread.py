@@ -12,40 +12,186 @@
 #  See the License for the specific language governing permissions and
 #  limitations under the License.
 
+from __future__ import annotations
+
 import threading
 import queue
-from gitlab.v4.objects.projects import Project
-from Utils import debugPrint
+from typing import TYPE_CHECKING
+from Utils import debugPrint, log, WARNING
+from gitlab_pager import iter_items
+from pod_mirror import PodMirror, MERGE_REQUEST_RE
+from related_mr_cache import get_cache_key, get_cached_urls, cache_urls
+
+if TYPE_CHECKING:
+    from gitlab.v4.objects.projects import Project
 
 
 class MergeRequestURLFetchThread(threading.Thread):
     """
-    获取组件库 merge request url 的线程
+    获取组件库 merge request url 的线程。
+    传入 from_commit_hash 时，获取两个 commit 之间合入的所有 merge request。
+    依次从本地缓存、本地镜像、接口获取，结果以 [url] 的形式放入队列。
+    线程为 daemon 线程，超时后调用 cancel，线程在下一次请求前退出，不再放入结果
     """
 
     @property
     def project_name(self):
         return self.proj.attributes['name']
 
-    def __init__(self, proj: Project, commit_hash: str, t_queue: queue.Queue):
-        super().__init__()
+    def __init__(self, proj: Project, commit_hash: str, t_queue: queue.Queue, from_commit_hash: str = ''):
+        super().__init__(daemon=True)
+        self.cancel_event = threading.Event()
         self.commitHash = commit_hash
+        self.fromCommitHash = from_commit_hash
         self.queue = t_queue
         self.proj = proj
+        # 查询过程中的异常（例如请求超时），出错时放入 commit 链接
+        self.error: Exception | None = None
+        # 区间查询时 commit_hash 本身是否已经合入默认分支。还没有合入时，之后合入它的 merge request 还会加入结果，不能缓存
+        self.to_merged = False
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    @property
+    def commit_url(self) -> str:
+        """
+        commit 链接，不需要请求接口
+        """
+        return f"{self.proj.attributes['web_url']}/-/commit/{self.commitHash}"
+
+    def put(self, urls: [str]):
+        if not self.cancel_event.is_set():
+            self.queue.put(urls)
+
+    @property
+    def cache_key(self) -> str:
+        from_commit_hash = self.fromCommitHash if self.fromCommitHash != self.commitHash else ''
+        return get_cache_key(self.project_name, self.commitHash, from_commit_hash)
+
+    @property
+    def is_range(self) -> bool:
+        return len(self.fromCommitHash) > 0 and self.fromCommitHash != self.commitHash
+
+    def put_merge_requests(self, urls: [str], cacheable: bool = True):
+        """
+        放入找到的 merge request 链接，结果不会再变化时写入本地缓存
+        """
+        self.put(urls)
+        if cacheable:
+            cache_urls(self.cache_key, urls)
+
+    def get_merge_request_url(self, path_with_namespace: str, iid: int) -> str:
+        # project web_url 去掉仓库路径就是 gitlab 地址
+        web_url: str = self.proj.attributes['web_url']
+        base_url = web_url[:len(web_url) - len(self.proj.attributes['path_with_namespace'])]
+        return f"{base_url}{path_with_namespace}/-/merge_requests/{iid}"
+
+    def resolve_from_mirror(self) -> [str]:
+        """
+        通过本地镜像获取 merge request，不请求接口
+        :return: merge request 链接，没有镜像、镜像中缺少 commit 或者没有找到时返回空数组
+        """
+        mirror = PodMirror(self.project_name)
+        if not mirror.exists():
+            return []
+        if self.is_range:
+            merge_requests = mirror.resolve_range(self.fromCommitHash, self.commitHash)
+            self.to_merged = mirror.is_merged(self.commitHash)
+        else:
+            merge_request = mirror.resolve_commit(self.commitHash)
+            merge_requests = [merge_request] if merge_request is not None else []
+        return [self.get_merge_request_url(path, iid) for path, iid in merge_requests]
+
+    def fetch_range_urls(self) -> [str]:
+        """
+        一次 compare 获取区间内所有 commit，只处理 commit_hash 的第一父提交链：
+        merge commit 直接从 message 中解析 merge request，其他 commit（squash、fast-forward 或者直接提交）
+        逐个请求 /repository/commits/:sha/merge_requests，请求数量不超过第一父提交链的长度
+        :return: merge request 链接，按合入时间从早到晚排列
+        """
+        compare: dict = self.proj.repository_compare(self.fromCommitHash, self.commitHash)
+        commits: dict[str, dict] = {commit['id']: commit for commit in compare.get('commits', [])}
+        debugPrint("project", self.project_name, "区间内共", len(commits), "个 commit")
+
+        chain: [dict] = []
+        sha = self.commitHash
+        while sha in commits:
+            chain.append(commits[sha])
+            parent_ids: [str] = commits[sha].get('parent_ids') or []
+            sha = parent_ids[0] if len(parent_ids) > 0 else ''
+        debugPrint("project", self.project_name, "第一父提交链共", len(chain), "个 commit")
+
+        urls: [str] = []
+        for commit in reversed(chain):
+            if self.cancel_event.is_set():
+                return []
+            found: [str] = []
+            result = MERGE_REQUEST_RE.search(commit.get('message', '')) \
+                if len(commit.get('parent_ids') or []) > 1 else None
+            if result is not None:
+                found.append(self.get_merge_request_url(result.group(1), int(result.group(2))))
+            else:
+                for mr in self.proj.commits.get(commit['id'], lazy=True).merge_requests(state='merged', get_all=True):
+                    # 部分 gitlab 版本不支持 state 参数，这里再过滤一次
+                    if mr.get('state') == 'merged':
+                        found.append(mr['web_url'])
+            for url in found:
+                if url not in urls:
+                    urls.append(url)
+            if commit['id'] == self.commitHash and len(found) > 0:
+                self.to_merged = True
+        return urls
 
     def run(self) -> None:
-        debugPrint(f"project { self.project_name } 开始获取 merge request")
-        debugPrint(f"当前线程：{ threading.current_thread().name } project: {self.project_name}")
+        try:
+            self.lookup()
+        except Exception as e:
+            self.error = e
+            log(WARNING, "project", self.project_name, "获取 merge request 失败:", e)
+            self.put([f'{self.commit_url}（merge request 查询失败）'])
+
+    def lookup(self):
+        debugPrint("project", self.project_name, "开始获取 merge request")
+        debugPrint("当前线程：", threading.current_thread().name, "project:", self.project_name)
+        urls = get_cached_urls(self.cache_key)
+        if len(urls) > 0:
+            self.put(urls)
+            debugPrint("project", self.project_name, "从本地缓存拿到 merge request:", urls)
+            return
+
+        urls = self.resolve_from_mirror()
+        if len(urls) > 0:
+            self.put_merge_requests(urls, cacheable=not self.is_range or self.to_merged)
+            debugPrint("project", self.project_name, "从本地镜像拿到 merge request:", urls)
+            return
+
+        # 镜像不存在或者不是最新的，通过接口获取
+        if self.is_range:
+            try:
+                urls = self.fetch_range_urls()
+            except Exception as e:
+                urls = []
+                log(WARNING, "project", self.project_name, "获取区间 merge request 失败:", e)
+            if self.cancel_event.is_set():
+                return
+            if len(urls) > 0:
+                self.put_merge_requests(urls, cacheable=self.to_merged)
+                debugPrint("project", self.project_name, "拿到区间内 merge request:", urls)
+                return
+
         # gitlab API 内部使用了同步操作，所以这里使用多线程的意义不大
-        mr_list = self.proj.mergerequests.list(state='merged', order_by='updated_at', get_all=True)
-        for mr in mr_list:
-            commit_list = [commit.id for commit in mr.commits()]
-            if self.commitHash in commit_list:
-                self.queue.put(mr.web_url)
-                debugPrint(f"project { self.project_name } 拿到 merge request: { mr.web_url }")
+        # 逐页查找，找到后不再请求后续页面；比对 commit 时提前请求下一页
+        for mr in iter_items(self.proj.mergerequests, prefetch=True, state='merged', order_by='updated_at'):
+            if self.cancel_event.is_set():
+                return
+            if self.commitHash in [commit.id for commit in mr.commits()]:
+                self.put_merge_requests([mr.web_url])
+                debugPrint("project", self.project_name, "拿到 merge request:", mr.web_url)
                 return
 
         # 没有找到对应的 MR 链接，直接返回 commit 对应的链接
-        self.queue.put(self.proj.commits.get(self.commitHash).web_url)
-        debugPrint(f"project { self.project_name } 没有拿到 merge request，返回 commit 链接：{self.proj.commits.get(self.commitHash).web_url}")
+        commit_url = self.proj.commits.get(self.commitHash).web_url
+        self.put([commit_url])
+        debugPrint("project", self.project_name, "没有拿到 merge request，返回 commit 链接：", commit_url)
         return
@@ -12,13 +12,38 @@
 #  See the License for the specific language governing permissions and
 #  limitations under the License.
 import os, sys
-from collections import namedtuple
+import threading
+import time
+import traceback
+from collections import deque, namedtuple
+from contextlib import contextmanager
+from datetime import datetime
 
 DEBUG_MODE = False
 
+# 日志级别
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+LEVEL_NAMES = {DEBUG: 'DEBUG', INFO: 'INFO', WARNING: 'WARNING', ERROR: 'ERROR'}
+# 内存中最多保留的日志条数
+DEBUG_LOG_CAPACITY = 2000
+DEBUG_LOG_FILE_NAME = 'debug.log'
+
+# (时间, 级别, 线程名, values, sep)，values 保持原样，只在输出或写入文件时才格式化
+LogRecord = namedtuple('LogRecord', ['created', 'level', 'thread', 'values', 'sep'])
+_log_records: deque = deque(maxlen=DEBUG_LOG_CAPACITY)
+
 MergeRequestInfo = namedtuple('MergeRequestInfo', ['url', 'id'])
 
 
+class UserCancelled(SystemExit):
+    """
+    使用者主动取消或者没有需要处理的内容，和 SystemExit 一样输出信息并退出，但不属于执行失败，不写入运行日志
+    """
+
+
 def get_root_path() -> str:
     """
     获取脚本库根路径
@@ -45,6 +70,26 @@ def update_debug_mode(value: bool):
     DEBUG_MODE = value
 
 
+def log(level: int, *values, sep=' ', end='\n', file=None):
+    """
+    记录日志。所有日志都会保存在内存中（最多 DEBUG_LOG_CAPACITY 条），WARNING 及以上级别总是输出到控制台，
+    其他级别只在 DEBUG 模式开启的状态下输出。
+    values 不会立即格式化，调用方应直接传入参数而不是拼好的 f-string，例如 debugPrint('project', name, '完成')
+    :param level: 日志级别
+    :param values: 日志内容
+    :param sep: 分隔符
+    :param end: 结束符
+    :param file: 文件
+    """
+    _log_records.append(LogRecord(time.time(), level, threading.current_thread().name, values, sep))
+    if DEBUG_MODE is True:
+        _values = (f'\r\033[K{Colors.WARNING}🐞',) + values + (Colors.ENDC,)
+        print(*_values, sep=sep, end=end, file=file)
+    elif level >= WARNING:
+        _values = (f'\r\033[K{Colors.WARNING}⚠️',) + values + (Colors.ENDC,)
+        print(*_values, sep=sep, end=end, file=file)
+
+
 def debugPrint(*values, sep=' ', end='\n', file=None):
     """
     只在 DEBUG 模式开启的状态下输出信息到控制台
@@ -54,9 +99,82 @@ def debugPrint(*values, sep=' ', end='\n', file=None):
     :param file: 文件
     :return:
     """
-    if DEBUG_MODE is True:
-        _values = (f'\r\033[K{Colors.WARNING}🐞',) + values + (Colors.ENDC,)
-        print(*_values, sep=sep, end=end, file=file)
+    log(DEBUG, *values, sep=sep, end=end, file=file)
+
+
+def format_log_record(record: LogRecord) -> str:
+    created = time.strftime('%H:%M:%S', time.localtime(record.created)) + f'.{int(record.created * 1000) % 1000:03d}'
+    try:
+        message = record.sep.join(str(value) for value in record.values)
+    except Exception as e:
+        message = f'<格式化失败: {e}>'
+    return f'{created} {LEVEL_NAMES.get(record.level, record.level):<7} [{record.thread}] {message}'
+
+
+def dump_debug_log(reason: str = '', path: str = '') -> str:
+    """
+    将内存中的日志写入文件，上次的文件会被覆盖
+    :param reason: 写入原因，例如异常信息
+    :param path: 文件路径，默认为脚本目录下的 debug.log
+    :return: 文件路径
+    """
+    if len(path) == 0:
+        path = os.path.join(get_root_path(), DEBUG_LOG_FILE_NAME)
+    with open(path, 'w') as f:
+        for record in list(_log_records):
+            f.write(format_log_record(record) + '\n')
+        if len(reason) > 0:
+            f.write(reason if reason.endswith('\n') else reason + '\n')
+    return path
+
+
+@contextmanager
+def dump_debug_log_on_failure():
+    """
+    执行失败（抛出异常或者以非 0 状态码退出）时将日志写入文件，方便没有开启 --debug 时排查问题
+    """
+    try:
+        yield
+    except UserCancelled:
+        raise
+    except SystemExit as e:
+        if e.code not in [None, 0]:
+            print_step(f'运行日志已保存到 {dump_debug_log(f"SystemExit: {e.code}")}')
+        raise
+    except KeyboardInterrupt:
+        raise
+    except Exception:
+        print_step(f'运行日志已保存到 {dump_debug_log(traceback.format_exc())}')
+        raise
+
+
+def join_threads(threads: list, deadline: float) -> list:
+    """
+    等待线程结束，最晚等到 deadline
+    :param threads: 线程
+    :param deadline: time.monotonic() 的截止时间
+    :return: 截止时仍未结束的线程
+    """
+    for thread in threads:
+        thread.join(max(0.0, deadline - time.monotonic()))
+    return [thread for thread in threads if thread.is_alive()]
+
+
+def parse_time(value: str) -> datetime:
+    """
+    解析 gitlab 接口返回的 ISO 8601 时间
+    """
+    # python 3.10 的 fromisoformat 不支持 Z 结尾
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+
+def later(a: str | None, b: str | None) -> str | None:
+    """
+    返回两个 ISO 8601 时间中较晚的一个，其中一个为空时返回另一个
+    """
+    if a is None or b is None:
+        return a or b
+    return a if parse_time(a) >= parse_time(b) else b
 
 
 def get_mr_url_from_local_log(log_path: str) -> MergeRequestInfo:
@@ -65,14 +183,22 @@ def get_mr_url_from_local_log(log_path: str) -> MergeRequestInfo:
     :param log_path: log 路径
     :return: merge request 信息，包含链接、ID 等
     """
+    with open(log_path, 'r') as f:
+        return get_mr_url_from_push_output(f.read())
+
+
+def get_mr_url_from_push_output(output: str) -> MergeRequestInfo:
+    """
+    从 git push 的输出中获取生成的 merge request 链接
+    :param output: git push 输出
+    :return: merge request 信息，包含链接、ID 等
+    """
     mr_url = ""
     mr_id = ""
-    with open(log_path, 'r') as f:
-        lines = f.readlines()
-        for line in lines:
-            if line.replace(' ', '').startswith("remote:http"):
-                mr_url = line.replace(' ', '').lstrip("remote:")
-                break
+    for line in output.splitlines():
+        if line.replace(' ', '').startswith("remote:http"):
+            mr_url = line.replace(' ', '').lstrip("remote:")
+            break
     if len(mr_url.split("/")) > 0:
         mr_id = mr_url.split("/")[-1]
     return MergeRequestInfo(mr_url, mr_id)
@@ -90,6 +216,22 @@ def search_file_path(file_name: str) -> str:
     return ''
 
 
+def search_file_paths(file_name: str, ignored_dirs: [str] = None) -> [str]:
+    """
+    在当前工作目录下搜索所有指定文件
+    :param file_name: 指定文件名
+    :param ignored_dirs: 不需要搜索的文件夹名，默认跳过 .git 和 Pods
+    :return: 所有指定文件的路径
+    """
+    ignored_dirs = ignored_dirs if ignored_dirs is not None else ['.git', 'Pods']
+    paths: [str] = []
+    for root, dirs, files in os.walk(os.getcwd()):
+        dirs[:] = [d for d in dirs if d not in ignored_dirs]
+        if file_name in files:
+            paths.append(os.path.join(root, file_name))
+    return paths
+
+
 def search_shell_file_path(file_name: str) -> str:
     """
     在脚本库目录下搜索指定文件，输出指定文件的路径
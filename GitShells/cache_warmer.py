@@ -0,0 +1,244 @@
+#  Copyright (c) 2023, Guanghui Liang. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""
+git hook 触发的后台缓存预热。
+
+提交或者切换分支后，在后台对比 Podfile 和默认目标分支的差异，更新改动组件库的本地镜像，
+查询相关 merge request 写入 related_merge_requests.json，并增量更新 pod 依赖索引。
+之后执行 createMR.sh 时可以直接使用缓存。
+
+用法（在主工程目录执行）:
+    python3 cache_warmer.py --install     # 安装 post-commit、post-checkout hook
+    python3 cache_warmer.py --uninstall   # 移除 hook
+    python3 cache_warmer.py               # 立即预热一次，hook 调用的也是这个命令
+
+hook 只启动一个后台进程就返回，不会拖慢 commit、checkout。
+同一个仓库同时只有一个预热进程，运行期间再次触发时只做标记，当前进程结束前会重新预热一次。
+"""
+
+from __future__ import annotations
+
+import fcntl
+import os
+import stat
+import subprocess
+import sys
+import time
+import traceback
+from typing import TYPE_CHECKING
+from Utils import debugPrint, get_root_path, print_step, log, INFO, WARNING, dump_debug_log, join_threads
+
+if TYPE_CHECKING:
+    import git
+
+HOOK_NAMES: [str] = ['post-commit', 'post-checkout']
+HOOK_BEGIN_MARKER = '# >>> GitShells cache warmer >>>'
+HOOK_END_MARKER = '# <<< GitShells cache warmer <<<'
+# 锁文件和重新预热标记都放在仓库的 .git 目录下
+LOCK_FILE_NAME = 'gitshells_cache_warmer.lock'
+PENDING_FILE_NAME = 'gitshells_cache_warmer.pending'
+WARMER_LOG_PATH: str = os.path.join(get_root_path(), 'cache_warmer.log')
+# 查询相关 merge request 的总时限，单位秒
+RELATED_MR_DEADLINE: float = 120
+# 运行期间反复触发时最多重新预热的次数
+MAX_ROUNDS: int = 3
+
+
+def get_hook_block(hook_name: str) -> str:
+    """
+    :return: 写入 hook 的脚本片段，rebase 过程中的提交不处理，post-checkout 只处理切换分支
+    """
+    condition = '[ ! -d "$(git rev-parse --git-path rebase-merge)" ] && [ ! -d "$(git rev-parse --git-path rebase-apply)" ]'
+    if hook_name == 'post-checkout':
+        condition = f'[ "$3" = "1" ] && {condition}'
+    script_path = os.path.abspath(__file__)
+    return (f'{HOOK_BEGIN_MARKER}\n'
+            f'if {condition}; then\n'
+            f'  nohup nice -n 10 python3 "{script_path}" > /dev/null 2>&1 < /dev/null &\n'
+            f'fi\n'
+            f'{HOOK_END_MARKER}\n')
+
+
+def remove_hook_block(content: str) -> str:
+    begin = content.find(HOOK_BEGIN_MARKER)
+    end = content.find(HOOK_END_MARKER)
+    if begin < 0 or end < 0:
+        return content
+    return content[:begin] + content[end + len(HOOK_END_MARKER):].lstrip('\n')
+
+
+def get_hooks_dir(repo_dir: str) -> str:
+    # 兼容 core.hooksPath 和 worktree
+    output = subprocess.run(['git', 'rev-parse', '--git-path', 'hooks'],
+                            cwd=repo_dir, capture_output=True, text=True, check=True).stdout.strip()
+    return os.path.join(repo_dir, output)
+
+
+def install_hooks(repo_dir: str):
+    """
+    安装 hook。已有的 hook 保留原有内容，脚本片段插入到 shebang 之后，避免原有脚本提前 exit 导致不执行
+    :param repo_dir: 仓库目录
+    """
+    hooks_dir = get_hooks_dir(repo_dir)
+    os.makedirs(hooks_dir, exist_ok=True)
+    for hook_name in HOOK_NAMES:
+        path = os.path.join(hooks_dir, hook_name)
+        content = '#!/bin/sh\n'
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                content = remove_hook_block(f.read())
+        lines = content.splitlines(keepends=True)
+        if len(lines) == 0 or not lines[0].startswith('#!'):
+            lines.insert(0, '#!/bin/sh\n')
+        lines.insert(1, get_hook_block(hook_name))
+        with open(path, 'w') as f:
+            f.write(''.join(lines))
+        os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+        print_step(f'已安装 {path}')
+
+
+def uninstall_hooks(repo_dir: str):
+    hooks_dir = get_hooks_dir(repo_dir)
+    for hook_name in HOOK_NAMES:
+        path = os.path.join(hooks_dir, hook_name)
+        if not os.path.exists(path):
+            continue
+        with open(path, 'r') as f:
+            content = f.read()
+        if HOOK_BEGIN_MARKER not in content:
+            continue
+        content = remove_hook_block(content)
+        # 只剩 shebang 的 hook 是安装时创建的，直接删除
+        if len(content.strip().splitlines()) <= 1 and content.startswith('#!'):
+            os.remove(path)
+        else:
+            with open(path, 'w') as f:
+                f.write(content)
+        print_step(f'已移除 {path} 中的缓存预热')
+
+
+def warm_related_merge_requests(helper, repo: git.Repo):
+    """
+    对比 Podfile 和默认目标分支，查询改动组件库的相关 merge request，结果由查询线程写入缓存
+    :param helper: createMR.MRHelper
+    :param repo: 仓库
+    """
+    import queue
+    from commit_helper import CommitHelper
+    from createMR import PODFILE
+    from lint import get_default_target_branch
+    from MergeRequestURLFetchThread import MergeRequestURLFetchThread
+    from pod_mirror import PodMirror, get_podfile_pod_urls
+
+    target_branch = get_default_target_branch(repo)
+    # 和 createMR 一样先更新目标分支，Podfile 的原 commit 才能和交互流程中的一致
+    subprocess.run(['git', 'fetch', '--quiet', 'origin', target_branch.replace('origin/', '', 1)],
+                   cwd=repo.working_tree_dir, capture_output=True)
+    diffs = CommitHelper.get_branches_files_diffs(repo, file_name=PODFILE, target_branch_name=target_branch)
+    changed_pod_commits = helper.get_changed_pod_commits(diffs)
+    log(INFO, '对比', target_branch, '共', len(changed_pod_commits), '个组件库改动')
+    if len(changed_pod_commits) == 0:
+        return
+
+    # 只更新已有的镜像，创建镜像需要下载完整历史，由使用者执行 pod_mirror.py
+    changed_names = {repo_name for repo_name, _ in changed_pod_commits}
+    for repo_name, url in get_podfile_pod_urls().items():
+        mirror = PodMirror(repo_name)
+        if repo_name in changed_names and mirror.exists():
+            mirror.sync(url)
+
+    threads: [MergeRequestURLFetchThread] = []
+    for (repo_name, commit_hash), from_commit_hash in changed_pod_commits.items():
+        proj = helper.get_gitlab_project(repo_name)
+        if proj is None:
+            log(WARNING, '没有找到组件库', repo_name)
+            continue
+        threads.append(MergeRequestURLFetchThread(proj,
+                                                  commit_hash=commit_hash,
+                                                  t_queue=queue.Queue(),
+                                                  from_commit_hash=from_commit_hash))
+    for thread in threads:
+        thread.start()
+    for thread in join_threads(threads, time.monotonic() + RELATED_MR_DEADLINE):
+        thread.cancel()
+        log(WARNING, '组件库', thread.project_name, '查询 merge request 超时')
+
+
+def warm_pod_index(helper):
+    """
+    增量更新 pod 依赖索引，没有生成过索引时不处理
+    """
+    from pod_index import PodIndex
+
+    index = PodIndex()
+    if index.is_empty():
+        return
+    count = index.refresh(helper.gitlab)
+    log(INFO, '索引更新', count, '个仓库')
+
+
+def warm_caches(repo_dir: str):
+    """
+    预热一轮，每一步失败不影响之后的步骤
+    """
+    from createMR import MRHelper
+
+    helper = MRHelper()
+    steps = [lambda: warm_related_merge_requests(helper, helper.repo), lambda: warm_pod_index(helper)]
+    for step in steps:
+        try:
+            step()
+        except Exception:
+            log(WARNING, '预热失败:', traceback.format_exc())
+    debugPrint('预热完成', repo_dir)
+
+
+def run(repo_dir: str):
+    """
+    获取仓库锁后预热，已经有进程在预热时只留下标记
+    :param repo_dir: 仓库目录
+    """
+    git_dir = subprocess.run(['git', 'rev-parse', '--absolute-git-dir'],
+                             cwd=repo_dir, capture_output=True, text=True, check=True).stdout.strip()
+    pending_path = os.path.join(git_dir, PENDING_FILE_NAME)
+    with open(os.path.join(git_dir, LOCK_FILE_NAME), 'w') as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            open(pending_path, 'w').close()
+            debugPrint('已有进程在预热，标记重新预热')
+            return
+        for _ in range(MAX_ROUNDS):
+            if os.path.exists(pending_path):
+                os.remove(pending_path)
+            warm_caches(repo_dir)
+            if not os.path.exists(pending_path):
+                break
+
+
+if __name__ == '__main__':
+    _repo_dir = os.getcwd()
+    if '--install' in sys.argv:
+        install_hooks(_repo_dir)
+    elif '--uninstall' in sys.argv:
+        uninstall_hooks(_repo_dir)
+    else:
+        _reason = ''
+        try:
+            run(_repo_dir)
+        except Exception:
+            _reason = traceback.format_exc()
+        # 后台进程没有输出，每次运行的日志写入文件方便排查
+        dump_debug_log(_reason, path=WARMER_LOG_PATH)
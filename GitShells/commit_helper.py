@@ -12,15 +12,23 @@
 #  See the License for the specific language governing permissions and
 #  limitations under the License.
 
+from __future__ import annotations
+
 import difflib
-import git.diff
-from git import Commit, Repo
-from typing import Union
+from typing import Union, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import git
+    import git.diff
+    from git import Commit, Repo
 
 
 class CommitHelper:
     @classmethod
     def get_diff_changed_lines(cls, file_diff: git.diff.Diff) -> [str]:
+        """
+        获取 diff 中新增的行。脚本内部已经改用 podfile_parser 解析整个 Podfile，这里只为兼容外部调用保留
+        """
         if file_diff is None:
             return []
         _changed_lines = []
@@ -35,51 +43,57 @@ class CommitHelper:
         return _changed_lines
 
     @classmethod
-    def get_branches_file_diff(cls, t_repo: git.Repo,
-                               file_name: str,
-                               target_branch_name: str,
-                               source_branch_name: str = '') -> git.diff.Diff | None:
+    def get_branches_files_diffs(cls, t_repo: git.Repo,
+                                 file_name: str,
+                                 target_branch_name: str,
+                                 source_branch_name: str = '') -> [git.diff.Diff]:
         """
-        获取指定文件在两个分支上的 diff
+        获取所有同名文件（例如主工程和 Example 中的 Podfile）在两个分支上的 diff，只执行一次 git diff
         :param t_repo: 仓库
         :param file_name: 文件名
         :param target_branch_name: 目标分支
         :param source_branch_name: 源分支
-        :return: diff
+        :return: 所有新增、删除、修改的同名文件 diff
         """
-        # last commit of source branch
         feature_branch: Union[git.Tree, git.Commit, None, str, object]
         if source_branch_name is None or len(source_branch_name) == 0:
             feature_branch = t_repo.head.commit.tree
         else:
             feature_branch = t_repo.commit(source_branch_name)
-        # last commit of target branch
         target_branch = t_repo.commit(target_branch_name)
 
-        # comparing
-        _diff = target_branch.diff(feature_branch)
-        _file = None
-
-        # collect new files
-        for file_diff in _diff.iter_change_type('A'):
-            if file_diff.b_blob is not None and file_diff.b_blob.name == file_name:
-                _file = file_diff
+        # 只比较同名文件，避免大仓库中 diff 所有文件
+        _diff = target_branch.diff(feature_branch, paths=[file_name, f':(glob)**/{file_name}'])
+        _files = []
+        for change_type in ['A', 'D', 'M']:
+            for file_diff in _diff.iter_change_type(change_type):
+                blob = file_diff.b_blob if file_diff.b_blob is not None else file_diff.a_blob
+                if blob is not None and blob.name == file_name:
+                    _files.append(file_diff)
+        return _files
 
-        # collect deleted files
-        for file_diff in _diff.iter_change_type('D'):
-            if file_diff.b_blob is not None and file_diff.b_blob.name == file_name:
-                _file = file_diff
-
-        # collect modified files
-        for file_diff in _diff.iter_change_type('M'):
-            # file.a_blob.name
-            if file_diff.b_blob is not None and file_diff.b_blob.name == file_name:
-                _file = file_diff
-
-        return _file
+    @classmethod
+    def get_branches_file_diff(cls, t_repo: git.Repo,
+                               file_name: str,
+                               target_branch_name: str,
+                               source_branch_name: str = '') -> git.diff.Diff | None:
+        """
+        获取指定文件在两个分支上的 diff。
+        脚本内部已经改用 get_branches_files_diffs 处理所有同名文件，这里只为兼容外部调用保留
+        :param t_repo: 仓库
+        :param file_name: 文件名
+        :param target_branch_name: 目标分支
+        :param source_branch_name: 源分支
+        :return: diff
+        """
+        _files = cls.get_branches_files_diffs(t_repo, file_name, target_branch_name, source_branch_name)
+        return _files[-1] if len(_files) > 0 else None
 
     @classmethod
     def get_changed_lines(cls, commit: Commit, t_file: str) -> [str]:
+        """
+        获取提交中同名文件新增的行。只为兼容外部调用保留
+        """
         _changed_lines = []
 
         # 找到跟 file 相关的文件，例如 ExamplePod/Podfile
@@ -13,7 +13,6 @@
 #  limitations under the License.
 import os
 from dataclasses import dataclass, field
-from dacite import from_dict
 from configparser import ConfigParser
 from Utils import get_root_path
 import json
@@ -46,6 +45,8 @@ class MergeRequestConfigModel:
 
 
 def get_config_model() -> MergeRequestConfigModel:
+    from dacite import from_dict
+
     file_path = get_root_path() + '/config.json'
     if not os.path.exists(file_path):
         raise SystemExit('⚠️ config.json 文件不存在。请先执行 createMR.sh --init')
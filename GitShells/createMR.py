@@ -18,32 +18,48 @@ required packages:
     pip3 install gitpython
 """
 
+# gitlab、git、requests 等依赖导入较慢，只在真正用到的地方导入，--init 等流程不需要等待
+from __future__ import annotations
+
 import getopt
 import getpass
 import os
 import queue
 import re
+import subprocess
 import sys
+import threading
 import time
-import git
-import gitlab
 import configparser
-import sendFeishuBotMessage
 import config_handler
 import shutil
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING
 from loadingAnimation import LoadingAnimation
 from makeQuestion import make_question
 from MergeRequestURLFetchThread import MergeRequestURLFetchThread
-from Utils import debugPrint, update_debug_mode, get_mr_url_from_local_log, MergeRequestInfo, print_step, \
-    search_file_path
-from gitlab.v4.objects.projects import Project
-from gitlab.v4.objects import ProjectMergeRequest
-from pathlib import Path
+from Utils import debugPrint, update_debug_mode, get_mr_url_from_push_output, MergeRequestInfo, print_step, \
+    search_file_path, log, INFO, WARNING, dump_debug_log_on_failure, join_threads, UserCancelled
 from commit_helper import CommitHelper
 from Utils import get_root_path
 from config_handler import MergeRequestConfigModel
+from gitlab_pager import iter_items, first_item
+from gitlab_single_flight import SingleFlight, install_single_flight
+from podfile_parser import get_pod_commits
+from repo_tuneup import has_uncommitted_changes, tune_up
+
+if TYPE_CHECKING:
+    import git
+    import gitlab
+    import git.diff
+    from gitlab.v4.objects.projects import Project
+    from gitlab.v4.objects import ProjectMergeRequest
 
 PODFILE = 'Podfile'
+# 单个 gitlab 请求的超时时间，单位秒
+REQUEST_TIMEOUT: float = 15
+# 获取所有组件库相关 merge request 的总时限，单位秒
+RELATED_MR_DEADLINE: float = 60
 COMMIT_CONFIRM_PROMPT = '''
 请确认将要用于生成 merge request 的提交:
     message: {message}
@@ -53,35 +69,146 @@ COMMIT_CONFIRM_PROMPT = '''
 
 
 class MRHelper:
+    """
+    仓库、配置、gitlab 等信息都在第一次访问时才创建。
+    本地检查（未提交改动、确认提交）不需要联网，确定需要联网后调用 start_network_prefetch 在后台提前获取
+    """
+
     def __init__(self):
-        self.gitlab = gitlab.Gitlab.from_config('Keep', [get_root_path() + '/MRConfig.ini'])
-        self.config_model: MergeRequestConfigModel = config_handler.get_config_model()
-        self.projects: [Project] = self.gitlab.projects.list(get_all=True)
-        self.repo = git.Repo(os.getcwd(), search_parent_directories=True)
-        self.current_proj = self.get_gitlab_project(self.get_repo_name(self.repo))
-        self.last_commit = CommitHelper.get_last_commit(self.repo)
+        self._repo: git.Repo | None = None
+        self._last_commit: git.Commit | None = None
+        self._gitlab: gitlab.Gitlab | None = None
+        self._single_flight: SingleFlight | None = None
+        self._config_model: MergeRequestConfigModel | None = None
+        self._current_proj: Project | None = None
+        self._repo_name: str | None = None
+        # 联网获取的属性共用一把锁，后台预取和主线程不会重复请求
+        self._network_lock = threading.RLock()
+        self._prefetch_thread: threading.Thread | None = None
+        # project 按页懒加载，找到目标 project 后不再继续请求
+        self.projects: dict[str, Project] = {}
+        self.projects_iter = None
         self.mr_fetcher_threads: [MergeRequestURLFetchThread] = []
+        # 多个目标分支同时添加 label 时，避免重复创建同名 label
+        self._label_lock = threading.Lock()
         self.queue = queue.Queue()
 
+    @property
+    def repo(self) -> git.Repo:
+        if self._repo is None:
+            import git
+
+            self._repo = git.Repo(os.getcwd(), search_parent_directories=True)
+        return self._repo
+
+    @property
+    def last_commit(self) -> git.Commit:
+        if self._last_commit is None:
+            self._last_commit = CommitHelper.get_last_commit(self.repo)
+        return self._last_commit
+
+    @last_commit.setter
+    def last_commit(self, commit: git.Commit):
+        self._last_commit = commit
+
+    @property
+    def repo_name(self) -> str:
+        if self._repo_name is None:
+            self._repo_name = self.get_repo_name(self.repo)
+        return self._repo_name
+
+    @property
+    def config_model(self) -> MergeRequestConfigModel:
+        if self._config_model is None:
+            self._config_model = config_handler.get_config_model()
+        return self._config_model
+
+    @property
+    def gitlab(self) -> gitlab.Gitlab:
+        with self._network_lock:
+            if self._gitlab is None:
+                import gitlab
+
+                self._gitlab = gitlab.Gitlab.from_config('Keep', [get_root_path() + '/MRConfig.ini'])
+                # from_config 没有配置 timeout 时默认 60 秒，单个请求最多等待 REQUEST_TIMEOUT，配置文件中可以设置得更短
+                self._gitlab.timeout = min(self._gitlab.timeout or REQUEST_TIMEOUT, REQUEST_TIMEOUT)
+                # 多个线程同时请求相同的数据时只发起一次请求
+                self._single_flight = install_single_flight(self._gitlab)
+            return self._gitlab
+
+    @property
+    def current_proj(self) -> Project:
+        with self._network_lock:
+            if self._current_proj is None:
+                proj = self.get_gitlab_project(self.repo_name)
+                if proj is None:
+                    raise SystemExit(f'⚠️ 没有在 gitlab 中找到当前仓库 {self.repo_name}！')
+                self._current_proj = proj
+            return self._current_proj
+
+    def start_network_prefetch(self):
+        """
+        确定需要联网后调用，在后台创建 gitlab client 并获取当前仓库对应的 project
+        """
+        if self._prefetch_thread is not None:
+            return
+        # 在主线程读取仓库名，后台线程不再访问本地仓库
+        _ = self.repo_name
+        self._prefetch_thread = threading.Thread(target=self._prefetch, daemon=True)
+        self._prefetch_thread.start()
+
+    def _prefetch(self):
+        try:
+            _ = self.current_proj
+        except Exception as e:
+            # 出错时不处理，主线程访问属性时会重新请求并抛出异常
+            log(INFO, "后台获取仓库配置失败:", e)
+
+    def wait_network_ready(self):
+        """
+        等待仓库配置获取完成，失败时终止流程
+        """
+        LoadingAnimation.sharedInstance.showWith('获取仓库配置中，需要联网，请耐心等待...',
+                                                 finish_message='仓库配置获取完成✅',
+                                                 failed_message='仓库配置获取失败❌')
+        try:
+            _ = self.config_model
+            _ = self.current_proj
+        except SystemExit:
+            LoadingAnimation.sharedInstance.failed = True
+            time.sleep(0.2)
+            raise
+        except Exception as e:
+            LoadingAnimation.sharedInstance.failed = True
+            time.sleep(0.2)
+            log(WARNING, "仓库配置获取失败:", e)
+            raise SystemExit(1)
+        LoadingAnimation.sharedInstance.finished = True
+
     @classmethod
     def get_repo_name(cls, repo: git.Repo) -> str:
         url_name = repo.remotes.origin.url.split('.git')[0].split('/')[-1]
         if len(url_name) > 0:
-            debugPrint(f"从仓库 url 中获取到仓库名字: {url_name}")
+            debugPrint("从仓库 url 中获取到仓库名字:", url_name)
             return url_name
         else:
             local_name = repo.working_tree_dir.split('/')[-1]
-            debugPrint(f"从仓库 url 中没有获取到仓库名字，返回本地文件夹名: {local_name}")
+            debugPrint("从仓库 url 中没有获取到仓库名字，返回本地文件夹名:", local_name)
             return local_name
 
     def get_relative_mr(self, repo_url: str, commit: str) -> str | None:
         repo_name = repo_url.split('.git')[0].split('/')[-1]
         proj = self.get_gitlab_project(repo_name)
-        mr_list = proj.mergerequests.list(state='merged', order_by='updated_at', get_all=True)
-        for mr in mr_list:
-            commit_list = [commit.id for commit in mr.commits()]
-            if commit in commit_list:
-                return mr.web_url
+        if proj is None:
+            log(WARNING, "没有找到组件库", repo_name)
+            return None
+        mr = first_item(proj.mergerequests,
+                        lambda x: commit in [c.id for c in x.commits()],
+                        prefetch=True,
+                        state='merged',
+                        order_by='updated_at')
+        if mr is not None:
+            return mr.web_url
 
         # 没有找到对应的 MR，则直接返回 commit 对应的链接
         return proj.commits.get(commit).web_url
@@ -103,7 +230,8 @@ class MRHelper:
     @classmethod
     def get_commit_and_name_from_changed_line(cls, changed_line: str) -> (str, str):
         """
-        从 changed_line 里获取组件库名称以及 commit hash
+        从 changed_line 里获取组件库名称以及 commit hash。
+        创建 merge request 的流程已经改用 get_changed_pod_commits，这里只为兼容外部调用保留
         :param changed_line: 从 git 中获取到的变更行
         :return: 仓库名称，commit hash
         """
@@ -147,17 +275,53 @@ class MRHelper:
                                         break
         return repo_name, commit_hash
 
-    def get_gitlab_project(self, keyword: str) -> Project:
-        for proj in self.projects:
-            # for proj in self.gitlab.projects.list(get_all=True):
-            if proj.name == keyword:
-                debugPrint(f"从本地已存储数组中找到 project {keyword}")
-                return proj
-        debugPrint(f"从本地已存储数组中没有找到 project {keyword}，重新拉取")
-        return self.gitlab.projects.list(search=keyword, get_all=True)[0]
+    @classmethod
+    def get_changed_pod_commits(cls, diffs: [git.diff.Diff]) -> dict[(str, str), str]:
+        """
+        对比所有 Podfile 的 diff，获取 commit 有变化的组件库
+        :param diffs: Podfile diff
+        :return: (仓库名, 新 commit) -> 原 commit，新增的组件库原 commit 为空字符串。多个 Podfile 中相同的改动只保留一个
+        """
+        changed: dict[(str, str), str] = {}
+        for file_diff in diffs:
+            if file_diff.b_blob is None:
+                continue
+            old_commits = get_pod_commits(file_diff.a_blob.data_stream.read().decode()) \
+                if file_diff.a_blob is not None else {}
+            new_commits = get_pod_commits(file_diff.b_blob.data_stream.read().decode())
+            debugPrint(file_diff.b_blob.path, '中共', len(new_commits), '个组件库')
+            for repo_name, commit_hash in new_commits.items():
+                old_commit_hash = old_commits.get(repo_name, '')
+                if old_commit_hash != commit_hash:
+                    changed.setdefault((repo_name, commit_hash), old_commit_hash)
+        return changed
+
+    def get_gitlab_project(self, keyword: str) -> Project | None:
+        """
+        按仓库名获取 gitlab project
+        :param keyword: 仓库名
+        :return: project，搜索不到时返回 None，调用方需要处理
+        """
+        with self._network_lock:
+            if keyword in self.projects:
+                debugPrint("从本地已存储数组中找到 project", keyword)
+                return self.projects[keyword]
+            if self.projects_iter is None:
+                self.projects_iter = iter_items(self.gitlab.projects, per_page=100)
+            for proj in self.projects_iter:
+                self.projects.setdefault(proj.name, proj)
+                if proj.name == keyword:
+                    debugPrint("从 project 列表中找到 project", keyword)
+                    return proj
+            debugPrint("从本地已存储数组中没有找到 project", keyword, "重新拉取")
+            proj = first_item(self.gitlab.projects, per_page=1, search=keyword)
+            # 多行 Podfile 指向同一个仓库时不再重复搜索
+            if proj is not None:
+                self.projects[keyword] = proj
+            return proj
 
     def check_has_uncommitted_changes(self) -> bool:
-        return self.repo.is_dirty(untracked_files=True)
+        return has_uncommitted_changes(self.repo.working_tree_dir)
 
     def addLabel(self, mr: ProjectMergeRequest, webhookUrl: str, open_id: str):
         """
@@ -172,8 +336,12 @@ class MRHelper:
             debugPrint("webhookUrl 或者 open_id 为空，不添加 label")
             return
 
+        with self._label_lock:
+            self._add_label(mr, webhookUrl, open_id)
+
+    def _add_label(self, mr: ProjectMergeRequest, webhookUrl: str, open_id: str):
         debugPrint("开始添加 label")
-        labels = self.current_proj.labels.list()
+        labels = list(iter_items(self.current_proj.labels, per_page=100))
         debugPrint(labels)
 
         # webhook
@@ -207,6 +375,110 @@ class MRHelper:
 
         mr.save()
 
+    @classmethod
+    def parse_target_branches(cls, value: str) -> [str]:
+        """
+        解析输入的目标分支
+        :param value: 用空格或逗号分隔的分支名，可以带 origin/ 前缀
+        :return: 去重后的分支名，保持输入顺序
+        """
+        branches: [str] = []
+        for name in re.split(r'[\s,，]+', value.strip()):
+            name = name.replace('origin/', '', 1) if name.startswith('origin/') else name
+            if len(name) > 0 and name not in branches:
+                branches.append(name)
+        return branches
+
+    def safe_push_merge_request(self, target_branch: str, source_branch: str, title: str, description: str) -> str:
+        """
+        push_merge_request 出错时只记录日志并返回空字符串，不影响其他目标分支
+        """
+        try:
+            return self.push_merge_request(target_branch, source_branch, title, description)
+        except Exception as e:
+            log(WARNING, "目标分支", target_branch, "创建 merge request 失败:", e)
+            return ''
+
+    def push_merge_request(self, target_branch: str, source_branch: str, title: str, description: str) -> str:
+        """
+        将 HEAD push 到源分支并创建 merge request，填写 description、添加 label。多个目标分支时在不同线程中同时执行
+        :param target_branch: 目标分支
+        :param source_branch: 远端新分支
+        :param title: merge request 标题
+        :param description: merge request description
+        :return: merge request 链接，创建失败时为空字符串
+        """
+        # 生成 MR。当用户对某些仓库没有管理权限时，使用 gitlab-python 内置的创建 MR 方法会失败，因此使用 shell 指令创建 MR
+        result = subprocess.run(['git', 'push',
+                                 '-o', 'merge_request.create',
+                                 '-o', f'merge_request.target={target_branch}',
+                                 '-o', f'merge_request.title={title}',
+                                 'origin', f'HEAD:refs/heads/{source_branch}'],
+                                cwd=self.repo.working_tree_dir, capture_output=True, text=True)
+        debugPrint("push 到", source_branch, "完成，返回值", result.returncode)
+        time.sleep(1)  # 等待
+        merge_request_url = ''
+
+        mr_info_from_local: MergeRequestInfo = get_mr_url_from_push_output(result.stdout + result.stderr)
+        if len(mr_info_from_local.url) > 0 and len(mr_info_from_local.id) > 0:
+            debugPrint("从 push 输出中拿到 merge request url:", mr_info_from_local.url)
+            merge_request_url = mr_info_from_local.url
+            try:
+                merge_request: ProjectMergeRequest = self.current_proj.mergerequests.get(mr_info_from_local.id)
+                debugPrint("从 push 输出中拿到 url:", merge_request.web_url, "id:", mr_info_from_local.id)
+                merge_request.description = description
+                self.addLabel(merge_request,
+                              self.config_model.feishu_bot_webhook,
+                              open_id=self.config_model.self_open_id)
+                merge_request.save()
+            except Exception as err:
+                log(INFO, err)
+                debugPrint("使用本地 mr id", mr_info_from_local.id, "没有拿到 merge request，尝试延迟重试")
+                retry_count = 0
+                found: bool = False
+                while retry_count < 8 and not found:
+                    debugPrint("第", retry_count, "次尝试获取刚创建的 merge request 链接")
+                    # 刚创建的 merge request 一般在第一页，找到后不再请求后续页面
+                    mr_list = iter_items(self.current_proj.mergerequests,
+                                         state='opened',
+                                         order_by='updated_at',
+                                         target_branch=target_branch)
+                    for mr in mr_list:
+                        mr: ProjectMergeRequest = mr
+                        debugPrint("比对 merge request:", mr.web_url)
+                        if merge_request_url == str(mr.web_url):
+                            debugPrint("merge request 比对成功，修改 description")
+                            mr.description = description
+                            self.addLabel(mr, self.config_model.feishu_bot_webhook,
+                                          open_id=self.config_model.self_open_id)
+                            mr.save()
+                            found = True
+                            break
+                    time.sleep(1)
+                    retry_count += 1
+        else:
+            retry_count = 0
+            while retry_count < 8 and len(merge_request_url) == 0:
+                debugPrint("第", retry_count, "次尝试获取刚创建的 merge request 链接")
+                # 多个目标分支的 merge request 包含相同的提交，按目标分支和源分支过滤
+                mr_list = iter_items(self.current_proj.mergerequests,
+                                     state='opened',
+                                     order_by='updated_at',
+                                     target_branch=target_branch,
+                                     source_branch=source_branch)
+                for mr in mr_list:
+                    commit_list = [commit.id for commit in mr.commits()]
+                    if self.last_commit.hexsha in commit_list:
+                        merge_request_url = mr.web_url
+                        mr.description = description
+                        self.addLabel(mr, self.config_model.feishu_bot_webhook,
+                                      open_id=self.config_model.self_open_id)
+                        mr.save()
+                        break
+                time.sleep(1)
+                retry_count += 1
+        return merge_request_url
+
     def create_merge_request(self):
         if self.check_has_uncommitted_changes():
             raise SystemExit('⚠️ 有未提交的更改！')
@@ -219,15 +491,21 @@ class MRHelper:
                   .rstrip())
             commit_confirm = make_question('请输入 y(回车)/n: ', ['y', 'n'])
             if commit_confirm == 'n':
-                raise SystemExit('取消生成 merge request')
-
-            # 输入目标分支
-            mr_target_br = make_question('请输入 MR 目标分支（直接回车会使用默认主分支）:')
-            if len(mr_target_br) == 0:
-                mr_target_br = 'master' \
-                    if ('origin/master' in [ref.name for ref in self.repo.remote().refs]) \
-                    else 'main'
-            print_step(f'目标分支: {mr_target_br}')
+                raise UserCancelled('取消生成 merge request')
+
+            # 之后的流程一定需要联网，在用户输入分支和标题的同时后台获取仓库配置
+            self.start_network_prefetch()
+
+            # 输入目标分支，可以同时输入多个
+            mr_target_brs = self.parse_target_branches(
+                make_question('请输入 MR 目标分支（多个分支用空格或逗号分隔，直接回车会使用默认主分支）:'))
+            if len(mr_target_brs) == 0:
+                mr_target_brs = ['master'
+                                 if ('origin/master' in [ref.name for ref in self.repo.remote().refs])
+                                 else 'main']
+            print_step(f'目标分支: {", ".join(mr_target_brs)}')
+            # Podfile diff、组件库 merge request 和 description 只基于第一个目标分支处理一次
+            mr_target_br = mr_target_brs[0]
 
             # 输入 MR 标题
             mr_title = make_question('请输入 MR 标题（直接回车会使用上述提交的 message）:')
@@ -235,6 +513,8 @@ class MRHelper:
                 mr_title = self.last_commit.message.split('\n')[0]
             print_step(f'message: {mr_title}')
 
+            self.wait_network_ready()
+
             # fetch 远端改动
             LoadingAnimation.sharedInstance.showWith('fetch 远端分支改动中...',
                                                      finish_message='fetch 远端改动完成✅',
@@ -244,23 +524,24 @@ class MRHelper:
             LoadingAnimation.sharedInstance.finished = True
 
             # 校验目标分支是否在远端
-            mr_target_br = mr_target_br.replace('origin/', '')
-            target_branch_remoted: bool = False
-            for remote in self.repo.remotes:
-                for ref in remote.refs:
-                    if ref.name == f"origin/{mr_target_br}":
-                        target_branch_remoted = True
-                        break
-            if not target_branch_remoted:
-                raise SystemExit('⚠️ 目标分支没有 push 到远端！')
-
-            # rebase 远端分支
-            debugPrint('开始对分支进行 rebase')
-            LoadingAnimation.sharedInstance.showWith('rebase 远端分支中...',
-                                                     finish_message='rebase 完成✅',
-                                                     failed_message='rebase 失败❌')
-            os.system(f'git rebase origin/{mr_target_br} > /dev/null 2>&1')
-            LoadingAnimation.sharedInstance.finished = True
+            remote_refs: [str] = [ref.name for remote in self.repo.remotes for ref in remote.refs]
+            missing_brs = [br for br in mr_target_brs if f"origin/{br}" not in remote_refs]
+            if len(missing_brs) > 0:
+                raise SystemExit(f'⚠️ 目标分支 {", ".join(missing_brs)} 没有 push 到远端！')
+
+            if len(mr_target_brs) == 1:
+                # rebase 远端分支
+                debugPrint('开始对分支进行 rebase')
+                LoadingAnimation.sharedInstance.showWith('rebase 远端分支中...',
+                                                         finish_message='rebase 完成✅',
+                                                         failed_message='rebase 失败❌')
+                os.system(f'git rebase origin/{mr_target_br} > /dev/null 2>&1')
+                LoadingAnimation.sharedInstance.finished = True
+            else:
+                # 同一个提交不能同时 rebase 到多个分支上，只检查是否基于各个目标分支
+                for br in mr_target_brs:
+                    if not self.repo.is_ancestor(f'origin/{br}', 'HEAD'):
+                        print_step(f'⚠️ 当前提交没有基于 origin/{br}，合入 {br} 的 merge request 可能包含其他提交或者有冲突')
 
             # 获取关联 MR
             LoadingAnimation.sharedInstance.showWith('处理 Podfile, 获取相关组件库 merge request 中...',
@@ -268,37 +549,63 @@ class MRHelper:
                                                      failed_message='组件库 merge request 处理失败❌')
             debugPrint("开始处理 Podfile")
             # 获取分支 diff
-            diff = CommitHelper.get_branches_file_diff(self.repo,
-                                                       file_name=PODFILE,
-                                                       target_branch_name=f"origin/{mr_target_br}")
-            file_changed_lines: [str] = CommitHelper.get_diff_changed_lines(diff)
-            debugPrint("Podfile 处理完成")
+            # 主工程、Example 等所有 Podfile 的改动
+            diffs = CommitHelper.get_branches_files_diffs(self.repo,
+                                                          file_name=PODFILE,
+                                                          target_branch_name=f"origin/{mr_target_br}")
+            changed_pod_commits = self.get_changed_pod_commits(diffs)
+            debugPrint(len(diffs), '个 Podfile 处理完成')
             relative_pod_mrs: [str] = []
-            for line in file_changed_lines:
-                line = re.sub('\s+', '', line)  # 去掉空格，方便提取
-                repo_name, commit_hash = self.get_commit_and_name_from_changed_line(changed_line=line)
-                if len(repo_name) and len(commit_hash):
-                    debugPrint(f"获取组件库 {repo_name} project")
-                    proj = self.get_gitlab_project(repo_name)
-                    debugPrint(f"组件库 {repo_name} project 获取成功")
-                    thread = MergeRequestURLFetchThread(proj, commit_hash=commit_hash, t_queue=self.queue)
-                    self.mr_fetcher_threads.append(thread)
+            missing_pods: [str] = []
+            for (repo_name, commit_hash), from_commit_hash in changed_pod_commits.items():
+                debugPrint("获取组件库", repo_name, "project")
+                proj = self.get_gitlab_project(repo_name)
+                if proj is None:
+                    debugPrint("没有找到组件库", repo_name)
+                    missing_pods.append(repo_name)
+                    continue
+                debugPrint("组件库", repo_name, "project 获取成功")
+                # 有原 commit 时获取两次 commit 之间的所有 merge request
+                thread = MergeRequestURLFetchThread(proj,
+                                                    commit_hash=commit_hash,
+                                                    t_queue=self.queue,
+                                                    from_commit_hash=from_commit_hash)
+                self.mr_fetcher_threads.append(thread)
 
             for thread in self.mr_fetcher_threads:
                 thread.start()
 
-            # 等待所有线程执行
-            for thread in self.mr_fetcher_threads:
-                thread.join()
-                debugPrint(f"线程 {thread.proj.attributes['name']} 完成")
+            # 等待所有线程执行，超时的组件库只提供 commit 链接
+            timed_out = join_threads(self.mr_fetcher_threads, time.monotonic() + RELATED_MR_DEADLINE)
+            for thread in timed_out:
+                thread.cancel()
+                debugPrint("线程", thread.project_name, "超时")
+
+            if self._single_flight is not None:
+                debugPrint("gitlab 请求", self._single_flight.requests, "次，合并重复请求",
+                           self._single_flight.hits, "次")
 
             # 取出队列所有元素
             while not self.queue.empty():
-                url = self.queue.get()
-                if len(url):
-                    relative_pod_mrs.append(url)
+                item = self.queue.get()
+                if not isinstance(item, list):
+                    continue
+                for url in item:
+                    if len(url) and url not in relative_pod_mrs:
+                        relative_pod_mrs.append(url)
+            for thread in timed_out:
+                relative_pod_mrs.append(f'{thread.commit_url}（merge request 查询超时）')
 
             LoadingAnimation.sharedInstance.finished = True
+            if len(timed_out) > 0:
+                print_step(f'⚠️ 以下组件库查询 merge request 超时，已使用 commit 链接: '
+                           f'{", ".join(thread.project_name for thread in timed_out)}')
+            if len(missing_pods) > 0:
+                print_step(f'⚠️ 没有在 gitlab 中找到以下组件库，已跳过: {", ".join(missing_pods)}')
+            failed = [thread for thread in self.mr_fetcher_threads if thread.error is not None]
+            if len(failed) > 0:
+                print_step(f'⚠️ 以下组件库查询 merge request 失败，已使用 commit 链接: '
+                           f'{", ".join(thread.project_name for thread in failed)}')
 
             description = ''
             if len(relative_pod_mrs) > 0:
@@ -308,115 +615,65 @@ class MRHelper:
             if len(description):
                 print_step('自动填写 description: ', str(description.replace('<p>', '\n').replace('</p>', '\n')))
 
-            source_branch = self.repo.head.ref.name
-            original_source_branch = source_branch
-            print_step('当前分支: ', source_branch)
+            # push 前检查 swift 文件，只提示不阻断
+            import lint
+
+            if not lint.check_before_push(self.repo, target_branch=f"origin/{mr_target_br}"):
+                print_step('⚠️ swiftlint 检查到问题，请留意上面的输出')
 
-            # 如果当前在主分支，则切换分支
-            # if source_branch in ['main', 'master', 'release', 'release_copy']:
+            if not self.repo.head.is_detached:
+                print_step('当前分支: ', self.repo.head.ref.name)
+
+            # 不切换本地分支，直接将 HEAD push 到远端的新分支，避免大仓库 checkout 的开销
+            # 每个目标分支使用单独的源分支，同一个分支 push 第二次时不会再创建 merge request
             username = getpass.getuser()
             _time = str(int(time.time()))
-            source_branch = username + '/mr' + _time
-            self.repo.git.checkout('-b', source_branch)
-            print_step('自动切换到分支: ', source_branch)
-
-            print_step(f'将分支 {source_branch} push 到 remote')
-            # self.repo.git.push('origin', source_branch)
-            # 生成 MR。当用户对某些仓库没有管理权限时，使用 gitlab-python 内置的创建 MR 方法会失败，因此使用 shell 指令创建 MR
-            cmd = f"git push " \
-                  f"-o merge_request.create " \
-                  f"-o merge_request.target={mr_target_br} " \
-                  f"-o merge_request.title=\"{mr_title}\" " \
-                  f"--set-upstream origin {source_branch} "
-
-            log_path = os.path.join(Path.home(), "mrLog.txt")
-            if os.path.exists(log_path):
-                os.remove(log_path)
-            os.system(f'{cmd} > {log_path} 2>&1')
-            time.sleep(1)  # 等待
-            LoadingAnimation.sharedInstance.showWith('获取 merge request 并修改 description 中...',
+            source_branches: dict[str, str] = {}
+            for br in mr_target_brs:
+                source_branches[br] = username + '/mr' + _time \
+                    if len(mr_target_brs) == 1 \
+                    else f"{username}/mr{_time}-{br.replace('/', '-')}"
+                print_step(f'将当前提交 push 到远端分支 {source_branches[br]}，目标分支 {br}')
+
+            LoadingAnimation.sharedInstance.showWith('push 并创建 merge request 中...',
                                                      finish_message='merge request 创建完成✅',
                                                      failed_message='')
-            merge_request_url = ''
-
-            mr_info_from_local: MergeRequestInfo = get_mr_url_from_local_log(log_path)
-            if len(mr_info_from_local.url) > 0 and len(mr_info_from_local.id) > 0:
-                debugPrint(f"从本地 log 中拿到 merge request url: {mr_info_from_local.url}")
-                merge_request_url = mr_info_from_local.url
-                try:
-                    merge_request: ProjectMergeRequest = self.current_proj.mergerequests.get(mr_info_from_local.id)
-                    debugPrint(f"从本地 log 中拿到 url: {merge_request.web_url}, id: {mr_info_from_local.id}")
-                    merge_request.description = description
-                    self.addLabel(merge_request,
-                                  self.config_model.feishu_bot_webhook,
-                                  open_id=self.config_model.self_open_id)
-                    merge_request.save()
-                except Exception as err:
-                    debugPrint(err)
-                    debugPrint(f"使用本地 mr id {mr_info_from_local.id} 没有拿到 merge request，尝试延迟重试")
-                    retry_count = 0
-                    found: bool = False
-                    while retry_count < 8 and not found:
-                        debugPrint(f"第 {retry_count} 次尝试获取刚创建的 merge request 链接")
-                        mr_list = self.current_proj.mergerequests.list(state='opened',
-                                                                       order_by='updated_at',
-                                                                       get_all=True)
-                        for mr in mr_list:
-                            mr: ProjectMergeRequest = mr
-                            debugPrint(f"比对 merge request: {str(mr.web_url)}")
-                            if merge_request_url == str(mr.web_url):
-                                debugPrint("merge request 比对成功，修改 description")
-                                mr.description = description
-                                self.addLabel(mr, self.config_model.feishu_bot_webhook,
-                                              open_id=self.config_model.self_open_id)
-                                mr.save()
-                                found = True
-                                break
-                        time.sleep(1)
-                        retry_count += 1
-            else:
-                retry_count = 0
-                while retry_count < 8 and len(merge_request_url) == 0:
-                    debugPrint(f"第 {retry_count} 次尝试获取刚创建的 merge request 链接")
-                    mr_list = self.current_proj.mergerequests.list(state='opened', order_by='updated_at', get_all=True)
-                    for mr in mr_list:
-                        commit_list = [commit.id for commit in mr.commits()]
-                        if self.last_commit.hexsha in commit_list:
-                            merge_request_url = mr.web_url
-                            mr.description = description
-                            self.addLabel(mr, self.config_model.feishu_bot_webhook,
-                                          open_id=self.config_model.self_open_id)
-                            mr.save()
-                            break
-                    time.sleep(1)
-                    retry_count += 1
-
+            # 各个目标分支的 push、创建 merge request、修改 description 并发执行
+            with ThreadPoolExecutor(max_workers=len(mr_target_brs)) as executor:
+                merge_request_urls: [str] = list(executor.map(
+                    lambda br: self.safe_push_merge_request(br, source_branches[br], mr_title, description),
+                    mr_target_brs))
             LoadingAnimation.sharedInstance.finished = True
 
-            print_step(f'删除本地分支 {source_branch}，并切换到原分支 {original_source_branch}')
-            self.repo.git.checkout(original_source_branch)
-            self.repo.delete_head(source_branch)
-
-            # 删除 log
-            try:
-                if os.path.exists(log_path):
-                    os.remove(log_path)
-            except FileNotFoundError as file_error:
-                debugPrint(f"删除本地 log 失败，文件不存在: {file_error}")
-
-            if len(merge_request_url) > 0:
-                print_step(f'merge request 创建成功，链接: \n    {merge_request_url}')
-                print('')
-                sendFeishuBotMessage.send_feishubot_message(merge_request_url,
-                                                            author=str(self.repo.config_reader().get_value("user",
-                                                                                                           "name")),
-                                                            message=mr_title.strip(),
-                                                            repo_name=self.get_repo_name(self.repo),
-                                                            target_branch=mr_target_br,
-                                                            config=self.config_model)
-            else:
+            created: [(str, str)] = [(br, url) for br, url in zip(mr_target_brs, merge_request_urls) if len(url) > 0]
+            failed_brs = [br for br, url in zip(mr_target_brs, merge_request_urls) if len(url) == 0]
+            if len(created) == 0:
                 raise SystemExit('merge request 创建失败！')
 
+            from mr_watcher import track_merge_request
+
+            print_step('merge request 创建成功，链接: ')
+            for br, merge_request_url in created:
+                print(f'    {br}: {merge_request_url}')
+                # 记录下来，之后可以通过 --watch 跟踪状态
+                track_merge_request(self.current_proj.id, merge_request_url)
+            print('')
+            if len(failed_brs) > 0:
+                print_step(f'⚠️ 以下目标分支的 merge request 创建失败: {", ".join(failed_brs)}')
+
+            import sendFeishuBotMessage
+
+            # 所有目标分支合并成一条通知
+            sendFeishuBotMessage.send_feishubot_message([url for _, url in created],
+                                                        author=str(self.repo.config_reader().get_value("user",
+                                                                                                       "name")),
+                                                        message=mr_title.strip(),
+                                                        repo_name=self.get_repo_name(self.repo),
+                                                        target_branches=[br for br, _ in created],
+                                                        config=self.config_model)
+            if len(failed_brs) > 0:
+                raise SystemExit(1)
+
 
 def get_config_new_value(key: str, section: str, config: configparser.ConfigParser):
     if key in config[section] and len(config[section][key]) > 0:
@@ -457,7 +714,7 @@ api_version = 4
 
 
 if __name__ == '__main__':
-    opts, args = getopt.getopt(sys.argv, "", ["--init", "--debug", "--lazy"])
+    opts, args = getopt.getopt(sys.argv, "", ["--init", "--debug", "--lazy", "--tune", "--watch", "--dashboard", "--full"])
 
     lazy_mode: bool = False
 
@@ -467,29 +724,43 @@ if __name__ == '__main__':
     if '--debug' in args:
         update_debug_mode(True)
         debugPrint('当前是 DEBUG 模式')
-    if '--lazy' in args:
-        from Utils import Colors
-
-        print(Colors.CBOLD + Colors.CGREEN + "当前是懒人模式，自动检测并更新组件库最新 commit（7 天内）" + Colors.ENDC)
-        lazy_mode = True
+    # 执行失败时将运行日志写入文件
+    with dump_debug_log_on_failure():
+        if '--tune' in args:
+            # 为当前仓库开启 commit-graph、untracked cache、fsmonitor
+            tune_up(MRHelper().repo.working_tree_dir)
+            raise SystemExit()
+        if '--watch' in args:
+            # 跟踪脚本创建的所有 merge request
+            from mr_watcher import MergeRequestWatcher
 
-    # 创建 merge request
-    LoadingAnimation.sharedInstance.showWith('获取仓库配置中，需要联网，请耐心等待...',
-                                             finish_message='仓库配置获取完成✅', failed_message='仓库配置获取失败❌')
-    try:
+            try:
+                MergeRequestWatcher(MRHelper().gitlab).run()
+            except KeyboardInterrupt:
+                pass
+            raise SystemExit()
+        if '--dashboard' in args:
+            # 跨仓库列出自己相关的 merge request
+            from mr_dashboard import show_dashboard
+
+            show_dashboard(MRHelper().gitlab, full='--full' in args)
+            raise SystemExit()
+        if '--lazy' in args:
+            from Utils import Colors
+
+            print(Colors.CBOLD + Colors.CGREEN + "当前是懒人模式，自动检测并更新组件库最新 commit（7 天内）" + Colors.ENDC)
+            lazy_mode = True
+
+        # 创建 merge request
         helper = MRHelper()
-    except Exception as e:
-        LoadingAnimation.sharedInstance.failed = True
-        time.sleep(0.2)
-        debugPrint(e)
-        raise SystemExit()
-    LoadingAnimation.sharedInstance.finished = True
-    if lazy_mode:
-        from createMR_lazy import do_lazy_create
-
-        do_lazy_create(helper)
-    else:
-        helper.create_merge_request()
+        if lazy_mode:
+            from createMR_lazy import do_lazy_create
+
+            helper.start_network_prefetch()
+            helper.wait_network_ready()
+            do_lazy_create(helper)
+        else:
+            helper.create_merge_request()
 
     # DEBUG
     # _diff = CommitHelper.get_branches_file_diff(helper.repo,
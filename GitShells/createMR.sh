@@ -39,6 +39,26 @@ while [[ $# -gt 0 ]]; do
       shift
 #      shift
       ;;
+    -w|--watch)
+      # 跟踪脚本创建的 merge request
+      watch="$1"
+      shift
+      ;;
+    -D|--dashboard)
+      # 列出自己相关的 merge request
+      dashboard="$1"
+      shift
+      ;;
+    --full)
+      # 看板忽略缓存全量刷新
+      full="$1"
+      shift
+      ;;
+    -t|--tune)
+      # 优化当前仓库的 git 配置
+      tune="$1"
+      shift
+      ;;
     -*)
       echo "Unknown option $1"
       exit 1
@@ -52,25 +72,22 @@ done
 
 BASEDIR=$(dirname "$0")
 
-# 安装依赖
-declare -a arr=("python-gitlab" "GitPython" "pick" "dacite" "numpy")
-for package in "${arr[@]}"
-do
-	# echo "$package"
-	env_check=$(pip3 --disable-pip-version-check list | grep -F "$package")
-	if [[ -z "$env_check" ]]; then
-		echo "$package 没有安装. 安装中..."
-		pip3 install "$package"
-	fi
-done
+# 检查并安装依赖，python 解释器和 requirements.txt 没有变化时直接跳过
+python3 "$BASEDIR/dependency_check.py" || exit 1
 
 if [ -n "$fast" ]; then
   mergeRequest.sh
 elif [ -n "$init" ]; then
   echo "创建配置文件中..."
     python3 "$BASEDIR/createMR.py" --init
+elif [ -n "$watch" ]; then
+  python3 "$BASEDIR/createMR.py" "$debug" --watch
+elif [ -n "$dashboard" ]; then
+  python3 "$BASEDIR/createMR.py" "$debug" --dashboard "$full"
+elif [ -n "$tune" ]; then
+  python3 "$BASEDIR/createMR.py" "$debug" --tune
 else
   python3 "$BASEDIR/createMR.py" "$debug" "$lazy"
 fi
 
-repo_update_check.sh
\ No newline at end of file
+"$BASEDIR"/repo_update_check.sh
\ No newline at end of file
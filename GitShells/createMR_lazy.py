@@ -12,15 +12,38 @@
 #  See the License for the specific language governing permissions and
 #  limitations under the License.
 
-import numpy as np
+import os
 import pick
-import re
-from Utils import debugPrint
-from createMR import MRHelper, search_file_path, PODFILE, CommitHelper
+import tempfile
+import time
+from Utils import debugPrint, print_step, search_file_paths, join_threads, UserCancelled
+from pod_index import PodIndex
+from podfile_parser import parse_pod_commit_spans, apply_commit_updates, PodCommitSpan
+from createMR import MRHelper, PODFILE, CommitHelper
 from loadingAnimation import LoadingAnimation
 from makeQuestion import make_question
 from project_latest_commit_get_thread import ProjectLatestCommitModel, ProjectLatestCommitGetThread
 
+# 获取所有组件库最新 commit 的总时限，单位秒
+LATEST_COMMIT_DEADLINE: float = 60
+
+
+def list_split(obj: list, count: int) -> [list]:
+    """
+    将数组拆分为 count 个长度尽量相等的子数组
+    :param obj: 数组
+    :param count: 子数组数量
+    :return: 子数组
+    """
+    size, remainder = divmod(len(obj), count)
+    result = []
+    start = 0
+    for i in range(count):
+        end = start + size + (1 if i < remainder else 0)
+        result.append(obj[start:end])
+        start = end
+    return result
+
 
 def do_lazy_create(helper: MRHelper):
     want_update_models: [ProjectLatestCommitModel] = update_all_project_commit(helper)
@@ -31,7 +54,6 @@ def do_lazy_create(helper: MRHelper):
 
 
 def update_all_project_commit(helper: MRHelper) -> [ProjectLatestCommitModel]:
-    file_path: str = search_file_path(PODFILE)
     latest_commit_threads: [ProjectLatestCommitGetThread] = []
 
     # 创建 merge request
@@ -39,33 +61,55 @@ def update_all_project_commit(helper: MRHelper) -> [ProjectLatestCommitModel]:
                                              finish_message='Podfile 处理完成✅',
                                              failed_message='Podfile 处理失败❌')
 
-    with open(file_path, 'r') as f:
-        lines: [str] = f.readlines()
-        for line in lines:
-            line = re.sub('\s+', '', line)
-            project_name, current_commit = helper.get_commit_and_name_from_changed_line(line)
-            if len(project_name) and len(current_commit) and ("gotokeep" in line):
-                thread = ProjectLatestCommitGetThread(proj=helper.get_gitlab_project(project_name),
-                                                      current_commit_hash=current_commit,
-                                                      to_queue=helper.queue)
-                latest_commit_threads.append(thread)
+    # 处理仓库中所有 Podfile，相同组件库的相同 commit 只获取一次
+    processed: set[(str, str)] = set()
+    missing_pods: [str] = []
+    for file_path in search_file_paths(PODFILE):
+        with open(file_path, 'r') as f:
+            spans: [PodCommitSpan] = parse_pod_commit_spans(f.read())
+        for span in spans:
+            if "gotokeep" not in span.url or (span.project_name, span.commit) in processed:
+                continue
+            processed.add((span.project_name, span.commit))
+            proj = helper.get_gitlab_project(span.project_name)
+            if proj is None:
+                debugPrint("没有找到组件库", span.project_name)
+                if span.project_name not in missing_pods:
+                    missing_pods.append(span.project_name)
+                continue
+            thread = ProjectLatestCommitGetThread(proj=proj,
+                                                  current_commit_hash=span.commit,
+                                                  to_queue=helper.queue)
+            latest_commit_threads.append(thread)
 
     LoadingAnimation.sharedInstance.finished = True
+    if len(missing_pods) > 0:
+        print_step(f'⚠️ 没有在 gitlab 中找到以下组件库，已跳过: {", ".join(missing_pods)}')
     LoadingAnimation.sharedInstance.showWith('获取所有组件库最新 commit 中，请耐心等待...',
                                              finish_message='所有组件库最新 commit 获取完成✅',
                                              failed_message='所有组件库最新 commit 获取失败❌')
 
-    split_arrays = np.array_split(latest_commit_threads, 3)     # 数组拆分，避免开启过多线程，触发警告
-    debugPrint(f"所有 project 被拆分为 { len(split_arrays) } 组")
+    split_arrays = list_split(latest_commit_threads, 3)     # 数组拆分，避免开启过多线程，触发警告
+    debugPrint("所有 project 被拆分为", len(split_arrays), "组")
+    deadline = time.monotonic() + LATEST_COMMIT_DEADLINE
+    timed_out: [ProjectLatestCommitGetThread] = []
     for threads in split_arrays:
+        if time.monotonic() >= deadline:
+            # 已经超时，剩余的组件库不再请求
+            timed_out.extend(threads)
+            continue
         for thread in threads:
             thread.start()
+        timed_out.extend(join_threads(threads, deadline))
 
-        for thread in threads:
-            thread.join()
-            debugPrint(f"获取最新 commit 线程 {thread.proj.attributes['name']} 完成")
-
+    for thread in timed_out:
+        thread.cancel()
     LoadingAnimation.sharedInstance.finished = True
+    if len(timed_out) > 0:
+        print_step(f'⚠️ 以下组件库获取最新 commit 超时，已跳过: {", ".join(t.project_name for t in timed_out)}')
+    failed = [thread for thread in latest_commit_threads if thread.error is not None]
+    if len(failed) > 0:
+        print_step(f'⚠️ 以下组件库获取最新 commit 失败，已跳过: {", ".join(t.project_name for t in failed)}')
 
     want_update_models: [ProjectLatestCommitModel] = pick_wanted_projects(helper)
     return want_update_models
@@ -87,7 +131,7 @@ def pick_wanted_projects(helper: MRHelper) -> [ProjectLatestCommitModel]:
 
     debugPrint("所有可以更新", need_update_models)
     if len(need_update_models) == 0:
-        raise SystemExit("当前没有可更新的组件库")
+        raise UserCancelled("当前没有可更新的组件库")
 
     # 询问用户
     pick.SYMBOL_CIRCLE_FILLED = '●'
@@ -101,30 +145,108 @@ def pick_wanted_projects(helper: MRHelper) -> [ProjectLatestCommitModel]:
                                min_selection_count=0)
 
     want_update_models = list(map(lambda x: need_update_models[x[1]], selected_items))
+    want_update_models = add_transitive_updates(need_update_models, want_update_models)
 
     debugPrint("期望更新", want_update_models)
     return want_update_models
 
 
+def add_transitive_updates(need_update_models: [ProjectLatestCommitModel],
+                           want_update_models: [ProjectLatestCommitModel]) -> [ProjectLatestCommitModel]:
+    """
+    根据 pod 依赖索引，提示依赖了所选组件库、同样可以更新的组件库
+    :param need_update_models: 所有可以更新的组件库
+    :param want_update_models: 用户选择的组件库
+    :return: 最终要更新的组件库
+    """
+    index = PodIndex()
+    if index.is_empty():
+        debugPrint("没有 pod 依赖索引，可以执行 pod_index.py 生成")
+        return want_update_models
+
+    dependents = index.get_transitive_dependents([model.project_name for model in want_update_models])
+    suggestions = [model for model in need_update_models
+                   if model not in want_update_models and model.project_name in dependents]
+    if len(suggestions) == 0:
+        return want_update_models
+
+    print_step('以下组件库依赖了所选的组件库，并且也有新的提交:')
+    for model in suggestions:
+        print(f"    {model.project_name}（依赖 {dependents[model.project_name]}）: {model.latest_commit_message}")
+    if make_question('是否一起更新？请输入 y(回车)/n: ', ['y', 'n']) == 'y':
+        return want_update_models + suggestions
+    return want_update_models
+
+
 def modify_pod_file(wanted_models: [ProjectLatestCommitModel]):
-    file_path: str = search_file_path(PODFILE)
-    debugPrint("文件路径", file_path)
+    file_paths: [str] = search_file_paths(PODFILE)
+    debugPrint("文件路径", file_paths)
     LoadingAnimation.sharedInstance.showWith('修改 Podfile 中...',
                                              finish_message='Podfile 修改完成✅',
                                              failed_message='Podfile 修改失败❌')
 
+    summaries: [str] = []
+    modified_count = 0
+    for file_path in file_paths:
+        count, file_summaries = modify_single_pod_file(file_path, wanted_models)
+        if count > 0:
+            modified_count += count
+            summaries.append(f"    {os.path.relpath(file_path)}:")
+            summaries.extend(file_summaries)
+
+    LoadingAnimation.sharedInstance.finished = True
+    print_step(f'Podfile 共修改 {modified_count} 处:')
+    print('\n'.join(summaries))
+
+
+def modify_single_pod_file(file_path: str, wanted_models: [ProjectLatestCommitModel]) -> (int, [str]):
+    """
+    修改单个 Podfile
+    :param file_path: Podfile 路径
+    :param wanted_models: 需要更新的组件库
+    :return: 修改的数量，修改摘要
+    """
     with open(file_path, 'r', encoding='UTF-8') as f:
         file_data = f.read()
 
+    # 只替换对应组件库条目中的 commit，不影响注释或者其他使用相同 commit 的组件库
+    spans_by_project: dict[str, [PodCommitSpan]] = {}
+    for span in parse_pod_commit_spans(file_data):
+        spans_by_project.setdefault(span.project_name, []).append(span)
+
+    updates: dict[int, PodCommitSpan] = {}
+    summaries: [str] = []
     for commit_model in wanted_models:
         commit_model: ProjectLatestCommitModel = commit_model
-        debugPrint(f"替换 { commit_model.project_name } 原 commit { commit_model.current_commit } 为 { commit_model.latest_commit }")
-        file_data = file_data.replace(commit_model.current_commit, commit_model.latest_commit)
+        spans = [span for span in spans_by_project.get(commit_model.project_name, [])
+                 if span.commit == commit_model.current_commit]
+        if len(spans) == 0:
+            continue
+        debugPrint(file_path, "替换", commit_model.project_name, "原 commit", commit_model.current_commit,
+                   "为", commit_model.latest_commit)
+        for span in spans:
+            updates[span.start] = span._replace(commit=commit_model.latest_commit)
+        summaries.append(f"        {commit_model.project_name}: "
+                         f"{commit_model.current_commit[:8]} -> {commit_model.latest_commit[:8]}")
+    if len(updates) == 0:
+        return 0, []
 
-    with open(file_path, 'w', encoding='UTF-8') as f:
-        f.write(file_data)
+    file_data = apply_commit_updates(file_data, list(updates.values()))
 
-    LoadingAnimation.sharedInstance.finished = True
+    # 先写临时文件再替换，避免写入中断导致 Podfile 损坏
+    file_dir = os.path.dirname(os.path.abspath(file_path))
+    fd, tmp_path = tempfile.mkstemp(dir=file_dir, prefix='.Podfile.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='UTF-8') as f:
+            f.write(file_data)
+        os.chmod(tmp_path, os.stat(file_path).st_mode)
+        os.replace(tmp_path, file_path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        LoadingAnimation.sharedInstance.failed = True
+        raise
+    return len(updates), summaries
 
 
 def commit_podfile_changes(helper: MRHelper, messages: [str]):
@@ -0,0 +1,84 @@
+#  Copyright (c) 2023, Guanghui Liang. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""
+检查 createMR.py 需要的依赖是否已安装，缺少时自动安装。
+
+检查通过后会记录当前 python 解释器路径和 requirements.txt 的 hash，两者都没有变化时直接跳过检查。
+"""
+
+import hashlib
+import os
+import subprocess
+import sys
+from importlib import metadata
+
+ROOT_PATH: str = os.path.dirname(os.path.abspath(__file__))
+REQUIREMENTS_PATH: str = os.path.join(ROOT_PATH, 'requirements.txt')
+STAMP_PATH: str = os.path.join(ROOT_PATH, '.dependency_stamp')
+
+
+def read_requirements() -> (str, [str]):
+    """
+    :return: requirements.txt 的 hash，依赖列表
+    """
+    with open(REQUIREMENTS_PATH, 'rb') as f:
+        content = f.read()
+    packages = [line.strip() for line in content.decode().splitlines()
+                if len(line.strip()) > 0 and not line.strip().startswith('#')]
+    return hashlib.sha1(content).hexdigest(), packages
+
+
+def get_stamp(requirements_hash: str) -> str:
+    return f'{sys.executable}\n{requirements_hash}\n'
+
+
+def is_stamp_valid(stamp: str) -> bool:
+    if not os.path.exists(STAMP_PATH):
+        return False
+    with open(STAMP_PATH, 'r') as f:
+        return f.read() == stamp
+
+
+def get_missing_packages(packages: [str]) -> [str]:
+    missing: [str] = []
+    for package in packages:
+        try:
+            metadata.version(package)
+        except metadata.PackageNotFoundError:
+            missing.append(package)
+    return missing
+
+
+def main() -> bool:
+    requirements_hash, packages = read_requirements()
+    stamp = get_stamp(requirements_hash)
+    if is_stamp_valid(stamp):
+        return True
+
+    missing = get_missing_packages(packages)
+    if len(missing) > 0:
+        print(f'{", ".join(missing)} 没有安装. 安装中...')
+        result = subprocess.run([sys.executable, '-m', 'pip', '--disable-pip-version-check', 'install', *missing])
+        if result.returncode != 0:
+            return False
+
+    with open(STAMP_PATH, 'w') as f:
+        f.write(stamp)
+    return True
+
+
+if __name__ == '__main__':
+    if not main():
+        raise SystemExit(1)
@@ -0,0 +1,98 @@
+#  Copyright (c) 2023, Guanghui Liang. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""
+gitlab 列表接口的分页迭代工具。
+
+按页请求数据并逐条返回，调用方找到想要的数据后直接 break 即可停止请求后续页面，
+避免 get_all=True 把整个列表都拉到内存中。
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator, Any
+from Utils import debugPrint
+
+# 默认每页数量，和 gitlab 接口默认值保持一致
+DEFAULT_PER_PAGE: int = 20
+# gitlab 接口允许的最大每页数量
+MAX_PER_PAGE: int = 100
+
+
+def iter_pages(manager, per_page: int = DEFAULT_PER_PAGE, prefetch: bool = False, **kwargs) -> Iterator[list]:
+    """
+    逐页获取列表数据
+    :param manager: gitlab 的 manager，例如 project.mergerequests
+    :param per_page: 每页数量
+    :param prefetch: 是否在处理当前页时提前请求下一页
+    :param kwargs: 透传给 manager.list 的参数，例如 state、order_by
+    :return: 每次返回一页数据
+    """
+    per_page = max(1, min(per_page, MAX_PER_PAGE))
+
+    def fetch(page: int) -> list:
+        debugPrint("请求", manager.path, "第", page, "页")
+        return manager.list(page=page, per_page=per_page, get_all=False, **kwargs)
+
+    executor = ThreadPoolExecutor(max_workers=1) if prefetch else None
+    try:
+        page = 1
+        future = executor.submit(fetch, page) if executor else None
+        while True:
+            items = future.result() if executor else fetch(page)
+            # 不足一页说明已经是最后一页
+            has_next = len(items) >= per_page
+            page += 1
+            if has_next and executor:
+                future = executor.submit(fetch, page)
+            if len(items) > 0:
+                yield items
+            if not has_next:
+                return
+    finally:
+        # 调用方提前结束迭代时，丢弃还没开始的预取请求
+        if executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+def iter_items(manager, per_page: int = DEFAULT_PER_PAGE, prefetch: bool = False, **kwargs) -> Iterator[Any]:
+    """
+    逐条获取列表数据，内部按页请求
+    :param manager: gitlab 的 manager
+    :param per_page: 每页数量
+    :param prefetch: 是否提前请求下一页
+    :param kwargs: 透传给 manager.list 的参数
+    :return: 列表数据迭代器
+    """
+    for items in iter_pages(manager, per_page=per_page, prefetch=prefetch, **kwargs):
+        yield from items
+
+
+def first_item(manager,
+               predicate: Callable[[Any], bool] | None = None,
+               per_page: int = DEFAULT_PER_PAGE,
+               prefetch: bool = False,
+               **kwargs) -> Any | None:
+    """
+    获取第一条满足条件的数据，找到后不再请求后续页面
+    :param manager: gitlab 的 manager
+    :param predicate: 过滤条件，为空时直接返回第一条
+    :param per_page: 每页数量
+    :param prefetch: 是否提前请求下一页
+    :param kwargs: 透传给 manager.list 的参数
+    :return: 满足条件的数据，没有找到返回 None
+    """
+    for item in iter_items(manager, per_page=per_page, prefetch=prefetch, **kwargs):
+        if predicate is None or predicate(item):
+            return item
+    return None
@@ -0,0 +1,101 @@
+#  Copyright (c) 2023, Guanghui Liang. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""
+gitlab GET 请求合并。
+
+多个线程同时发起相同的请求（method、路径、参数都相同）时，只有第一个线程真正请求，
+其他线程等待并共用同一个结果。请求结束后不缓存结果，之后的相同请求会重新发起。
+"""
+
+from __future__ import annotations
+
+import json
+import threading
+from typing import TYPE_CHECKING, Any, Callable
+from Utils import debugPrint
+
+if TYPE_CHECKING:
+    import gitlab
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result: Any = None
+        self.error: BaseException | None = None
+
+
+class SingleFlight:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: dict[str, _Call] = {}
+        # 实际发起的请求数、合并掉的请求数
+        self.requests = 0
+        self.hits = 0
+
+    def do(self, key: str, func: Callable[[], Any]) -> Any:
+        """
+        执行 func，相同 key 的并发调用共用一次执行结果
+        :param key: 请求标识
+        :param func: 实际发起请求的方法
+        :return: func 的返回值
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self.requests += 1
+            else:
+                self.hits += 1
+
+        if not leader:
+            debugPrint('合并重复请求:', key)
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+
+def install_single_flight(gl: gitlab.Gitlab) -> SingleFlight:
+    """
+    为 gitlab 实例的 GET 请求开启请求合并，流式请求不处理
+    :param gl: gitlab 实例
+    :return: SingleFlight，可以从中读取合并次数
+    """
+    flight = SingleFlight()
+    original = gl.http_request
+
+    def http_request(verb: str, path: str, *args, **kwargs):
+        if verb.lower() != 'get' or len(args) > 0 or kwargs.get('streamed', False):
+            return original(verb, path, *args, **kwargs)
+        key = f'{verb.upper()} {path} {json.dumps(kwargs, sort_keys=True, default=str)}'
+        return flight.do(key, lambda: original(verb, path, **kwargs))
+
+    gl.http_request = http_request
+    return flight
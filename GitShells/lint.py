@@ -1,18 +1,337 @@
-from git import Repo
+from __future__ import annotations
+
 from pathlib import Path
+from typing import TYPE_CHECKING
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+import hashlib
+import json
 import os
+import shutil
 import subprocess
+import sys
+import time
+from Utils import debugPrint, print_step, update_debug_mode
+
+if TYPE_CHECKING:
+    from git import Repo
+
+SWIFTLINT_CONFIG = '.swiftlint.yml'
+# 缓存文件，放在仓库的 .git 目录下。
+# v2 起只记录 lint 没有报告问题的文件，之前的缓存和状态文件可能包含还有问题的文件，不再读取
+CACHE_FILE_NAME = 'swiftlint_cache_v2.json'
+# 缓存最多保留的条目数量
+CACHE_MAX_COUNT = 5000
+# watch 模式的状态文件，createMR.py 据此判断是否需要重新 lint
+STATUS_FILE_NAME = 'swiftlint_status_v2.json'
+# watch 模式轮询间隔
+POLL_INTERVAL = 0.5
+# 文件停止变化多久之后开始 lint
+DEBOUNCE_SECONDS = 1.0
+# 重新获取仓库文件列表的间隔
+FILE_LIST_REFRESH_INTERVAL = 30
+
+
+@dataclass
+class LintReport:
+    # 实际执行 swiftlint 的文件数量
+    linted_count: int = 0
+    # 命中缓存跳过的文件数量
+    cached_count: int = 0
+    # 实际耗时
+    elapsed: float = 0
+    # 所有批次耗时之和，即串行执行需要的时间
+    sequential_elapsed: float = 0
+    # lint 之后没有剩余问题的文件
+    clean_files: [str] = field(default_factory=list)
+
+
+def get_default_target_branch(repo: Repo) -> str:
+    return 'origin/master' \
+        if ('origin/master' in [ref.name for ref in repo.remote().refs]) \
+        else 'origin/main'
+
+
+def get_changed_files(repo: Repo, target_branch: str = '') -> [str]:
+    """
+    获取需要 lint 的 swift 文件，包含未暂存、已暂存以及当前分支相对目标分支的改动
+    :param repo: 仓库
+    :param target_branch: 目标分支，为空时不比较分支改动
+    :return: 文件绝对路径
+    """
+    paths: set[str] = set()
+    paths.update(item.a_path for item in repo.index.diff(None))
+    paths.update(item.a_path for item in repo.index.diff('HEAD'))
+    if len(target_branch) > 0:
+        merge_bases = repo.merge_base(target_branch, 'HEAD')
+        if len(merge_bases) > 0:
+            paths.update(item.b_path for item in merge_bases[0].diff('HEAD') if item.b_path is not None)
+    files = [os.path.join(repo.working_tree_dir, path) for path in paths]
+    return sorted(filter(lambda x: Path(x).suffix == '.swift' and os.path.exists(x), files))
+
+
+def get_file_hash(file_path: str) -> str:
+    with open(file_path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+class LintCache:
+    """
+    已经 lint 过的文件缓存，key 为文件内容 hash + swiftlint 配置 hash
+    """
+
+    def __init__(self, repo: Repo):
+        self.path = os.path.join(repo.git_dir, CACHE_FILE_NAME)
+        config_path = os.path.join(repo.working_tree_dir, SWIFTLINT_CONFIG)
+        self.config_hash = get_file_hash(config_path) if os.path.exists(config_path) else ''
+        self.entries: dict[str, float] = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r') as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError) as e:
+                debugPrint("读取 lint 缓存失败，忽略缓存:", e)
+
+    def key(self, file_path: str) -> str:
+        return get_file_hash(file_path) + self.config_hash
+
+    def contains(self, file_path: str) -> bool:
+        return self.key(file_path) in self.entries
+
+    def add(self, file_path: str):
+        if os.path.exists(file_path):
+            self.entries[self.key(file_path)] = time.time()
+
+    def save(self):
+        if len(self.entries) > CACHE_MAX_COUNT:
+            newest = sorted(self.entries.items(), key=lambda x: x[1], reverse=True)[:CACHE_MAX_COUNT]
+            self.entries = dict(newest)
+        with open(self.path, 'w') as f:
+            json.dump(self.entries, f)
+
+
+def run_swiftlint(files: [str], cwd: str) -> (float, [str]):
+    """
+    对一批文件执行一次 swiftlint autocorrect，再 lint 一次找出还有问题的文件。
+    autocorrect 即使还有无法自动修复的问题也会返回 0，不能用返回值判断
+    :param files: 文件路径
+    :param cwd: 执行目录，swiftlint 从这里查找配置文件
+    :return: 耗时，没有剩余问题的文件
+    """
+    start = time.perf_counter()
+    result = subprocess.run(['swiftlint', '--fix', '--quiet', *files], cwd=cwd, capture_output=True, text=True)
+    output = (result.stdout + result.stderr).strip()
+    if len(output) > 0:
+        print(output)
+    result = subprocess.run(['swiftlint', 'lint', '--quiet', '--reporter', 'json', *files],
+                            cwd=cwd, capture_output=True, text=True)
+    try:
+        violations: [dict] = json.loads(result.stdout)
+    except ValueError:
+        # 输出无法解析时当作都有问题，下次继续检查
+        print((result.stdout + result.stderr).strip())
+        return time.perf_counter() - start, []
+    for violation in violations:
+        print(f"{violation.get('file')}:{violation.get('line')}:{violation.get('character') or 1}: "
+              f"{str(violation.get('severity', '')).lower()}: {violation.get('reason')} ({violation.get('rule_id')})")
+    dirty = {os.path.realpath(violation['file']) for violation in violations if violation.get('file') is not None}
+    return time.perf_counter() - start, [file for file in files if os.path.realpath(file) not in dirty]
+
 
+def split_batches(files: [str], count: int) -> [[str]]:
+    return [batch for batch in (files[i::count] for i in range(count)) if len(batch) > 0]
 
-def get_changed_files(repo: Repo) -> [str]:
-    files = [os.path.abspath(item.a_path) for item in repo.index.diff(None)]
-    return list(filter(lambda x: Path(x).suffix == '.swift', files))
+
+def lint_files(repo: Repo, files: [str], cache: LintCache, executor: ThreadPoolExecutor,
+               worker_count: int) -> LintReport:
+    """
+    并行 lint 文件，跳过缓存中已经 lint 过的文件
+    :param repo: 仓库
+    :param files: 文件路径
+    :param cache: lint 缓存
+    :param executor: 执行 swiftlint 的线程池
+    :param worker_count: 同时执行的 swiftlint 进程数量
+    :return: 统计信息
+    """
+    start = time.perf_counter()
+    report = LintReport()
+    pending: [str] = []
+    for file in files:
+        if cache.contains(file):
+            debugPrint("命中缓存，跳过", file)
+            report.clean_files.append(file)
+        else:
+            pending.append(file)
+    report.cached_count = len(files) - len(pending)
+    report.linted_count = len(pending)
+
+    batches = split_batches(pending, worker_count)
+    results = executor.map(lambda batch: run_swiftlint(batch, repo.working_tree_dir), batches)
+    for elapsed, clean_files in results:
+        report.sequential_elapsed += elapsed
+        # 只有 lint 没有报告问题的文件才写入缓存，还有无法自动修复的问题的文件下次继续检查
+        for file in clean_files:
+            cache.add(file)
+        report.clean_files.extend(clean_files)
+    cache.save()
+    report.elapsed = time.perf_counter() - start
+    return report
+
+
+def print_report(report: LintReport):
+    print_step(f'lint {report.linted_count} 个文件，跳过 {report.cached_count} 个已检查的文件，'
+               f'耗时 {report.elapsed:.2f}s')
+    if report.linted_count > 0:
+        per_file = report.sequential_elapsed / report.linted_count
+        # 相对逐个文件串行执行：并行节省的时间 + 缓存跳过的文件预计耗时
+        saved = max(report.sequential_elapsed - report.elapsed, 0) + per_file * report.cached_count
+        print_step(f'预计节省 {saved:.2f}s')
+
+
+def read_status(repo: Repo) -> dict[str, str]:
+    """
+    读取 watch 模式写入的状态
+    :param repo: 仓库
+    :return: 没有问题的文件 -> 文件内容 hash
+    """
+    path = os.path.join(repo.git_dir, STATUS_FILE_NAME)
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r') as f:
+            return json.load(f).get('clean_files', {})
+    except (OSError, ValueError) as e:
+        debugPrint("读取 lint 状态失败:", e)
+        return {}
+
+
+def write_status(repo: Repo, clean_files: dict[str, str]):
+    path = os.path.join(repo.git_dir, STATUS_FILE_NAME)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({'updated_at': time.time(), 'pid': os.getpid(), 'clean_files': clean_files}, f)
+    os.replace(tmp_path, path)
+
+
+def is_status_up_to_date(repo: Repo, files: [str]) -> bool:
+    """
+    判断 watch 模式是否已经 lint 过这些文件的当前内容
+    :param repo: 仓库
+    :param files: 文件绝对路径
+    :return: 所有文件都已 lint 且没有问题时返回 True
+    """
+    clean_files = read_status(repo)
+    for file in files:
+        if clean_files.get(file) != get_file_hash(file):
+            return False
+    return True
+
+
+def check_before_push(repo: Repo, target_branch: str) -> bool:
+    """
+    push 前只检查（不修复）改动的 swift 文件，watch 模式已经检查过当前内容时跳过
+    :param repo: 仓库
+    :param target_branch: 目标分支，例如 origin/master
+    :return: 是否没有问题
+    """
+    if shutil.which('swiftlint') is None:
+        debugPrint('没有安装 swiftlint，跳过 lint')
+        return True
+    files = get_changed_files(repo, target_branch=target_branch)
+    if len(files) == 0:
+        return True
+    if is_status_up_to_date(repo, files):
+        print_step('改动的 swift 文件已经由 lint.py --watch 检查过，跳过 lint')
+        return True
+    result = subprocess.run(['swiftlint', 'lint', '--quiet', *files],
+                            cwd=repo.working_tree_dir, capture_output=True, text=True)
+    output = (result.stdout + result.stderr).strip()
+    if len(output) > 0:
+        print(output)
+    return result.returncode == 0
+
+
+def get_tracked_files(repo: Repo) -> [str]:
+    return [os.path.join(repo.working_tree_dir, path)
+            for path in repo.git.ls_files('*.swift').splitlines() if len(path) > 0]
+
+
+def get_mtimes(files: [str]) -> dict[str, float]:
+    mtimes: dict[str, float] = {}
+    for file in files:
+        try:
+            mtimes[file] = os.stat(file).st_mtime
+        except FileNotFoundError:
+            continue
+    return mtimes
+
+
+def watch(repo: Repo):
+    """
+    轮询仓库中所有 swift 文件，文件停止变化后只对变化的文件重新 lint
+    :param repo: 仓库
+    """
+    cache = LintCache(repo)
+    count = os.cpu_count() or 1
+    files = get_tracked_files(repo)
+    files_refreshed_at = time.monotonic()
+    mtimes = get_mtimes(files)
+    clean_files: dict[str, str] = {file: file_hash for file, file_hash in read_status(repo).items() if file in mtimes}
+    pending: set[str] = set()
+    last_change = 0.0
+    print_step(f'开始监听 {len(files)} 个 swift 文件，Ctrl+C 结束')
+    # 线程池常驻，避免每次保存都重新创建
+    with ThreadPoolExecutor(max_workers=count) as pool:
+        try:
+            while True:
+                time.sleep(POLL_INTERVAL)
+                if time.monotonic() - files_refreshed_at > FILE_LIST_REFRESH_INTERVAL:
+                    files = get_tracked_files(repo)
+                    files_refreshed_at = time.monotonic()
+                current = get_mtimes(files)
+                changed = {file for file, mtime in current.items() if mtimes.get(file) != mtime}
+                mtimes = current
+                if len(changed) > 0:
+                    # 合并连续的修改，等文件稳定后再 lint
+                    pending |= changed
+                    last_change = time.monotonic()
+                    for file in changed:
+                        clean_files.pop(file, None)
+                    continue
+                if len(pending) == 0 or time.monotonic() - last_change < DEBOUNCE_SECONDS:
+                    continue
+
+                changed_files = sorted(file for file in pending if os.path.exists(file))
+                pending.clear()
+                debugPrint("重新 lint:", changed_files)
+                report = lint_files(repo, changed_files, cache, pool, min(count, max(len(changed_files), 1)))
+                print_report(report)
+                # clean_files 只包含 lint 没有报告问题（或者之前已经确认没有问题）的文件
+                for file in report.clean_files:
+                    clean_files[file] = get_file_hash(file)
+                # swiftlint 自动修复会修改文件，更新修改时间，避免再次触发
+                mtimes.update(get_mtimes(changed_files))
+                write_status(repo, clean_files)
+        except KeyboardInterrupt:
+            print_step('结束监听')
 
 
 if __name__ == '__main__':
+    from git import Repo
+
+    if '--debug' in sys.argv:
+        update_debug_mode(True)
     repo = Repo(os.getcwd(), search_parent_directories=True)
-    file_paths = get_changed_files(repo)
-    print(file_paths)
-    for file in file_paths:
-        swiftlint_output = subprocess.check_output(['swiftlint', 'autocorrect', '--path', file, '--fix'])
-        print(swiftlint_output)
+    if '--watch' in sys.argv:
+        watch(repo)
+        raise SystemExit()
+    target = sys.argv[sys.argv.index('--target') + 1] if '--target' in sys.argv else get_default_target_branch(repo)
+    file_paths = get_changed_files(repo, target_branch=target)
+    debugPrint(file_paths)
+    count = max(1, min(os.cpu_count() or 1, len(file_paths)))
+    with ThreadPoolExecutor(max_workers=count) as pool:
+        lint_report = lint_files(repo, file_paths, LintCache(repo), pool, count)
+    print_report(lint_report)
+    status = read_status(repo)
+    status.update({file: get_file_hash(file) for file in lint_report.clean_files})
+    write_status(repo, status)
@@ -1,7 +1,6 @@
 from termios import tcflush, TCIFLUSH
 import sys
 from Utils import Colors
-import readline
 
 
 def make_question(prompt: str, expect_answers: [str] = None):
@@ -11,6 +10,9 @@ def make_question(prompt: str, expect_answers: [str] = None):
     :param expect_answers: 有效答案
     :return: 有效答案中的其中一个。如果用户直接回车，则返回有效答案中的第一个
     """
+    # 导入 readline 后 input 才支持方向键等行编辑操作
+    import readline
+
     valid = False
     expect_answers = expect_answers if (expect_answers is not None) else []
     while not valid:
@@ -0,0 +1,149 @@
+#  Copyright (c) 2023, Guanghui Liang. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""
+"我的 merge request" 看板：跨仓库列出自己创建、指派给自己、需要自己 review 的 merge request。
+
+使用实例级别的 /merge_requests 接口，每种身份一次分页查询，结果缓存在 my_merge_requests.json 中。
+之后只请求 updated_after 游标之后有变化的 merge request，超过 FULL_REFRESH_INTERVAL 后全量刷新一次，
+以清理被取消指派、取消 review 的记录。
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING
+from Utils import debugPrint, get_root_path, print_step, Colors, later
+from gitlab_pager import iter_items
+
+if TYPE_CHECKING:
+    import gitlab
+
+DASHBOARD_CACHE_PATH: str = os.path.join(get_root_path(), 'my_merge_requests.json')
+# 全量刷新的间隔，单位秒
+FULL_REFRESH_INTERVAL: int = 24 * 60 * 60
+# 身份 -> 显示名
+ROLE_NAMES: dict[str, str] = {'author': '创建', 'assignee': '指派', 'reviewer': 'review'}
+
+
+def load_cache(path: str = DASHBOARD_CACHE_PATH) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def save_cache(cache: dict, path: str = DASHBOARD_CACHE_PATH):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.my_merge_requests_')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(cache, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def get_role_queries(username: str) -> dict[str, dict]:
+    return {'author': {'scope': 'created_by_me'},
+            'assignee': {'scope': 'assigned_to_me'},
+            'reviewer': {'scope': 'all', 'reviewer_username': username}}
+
+
+def fetch_role(gl: gitlab.Gitlab, role: str, query: dict, cursor: str | None) -> (str, list):
+    kwargs = dict(query)
+    if cursor is None:
+        kwargs['state'] = 'opened'
+    else:
+        # 增量请求不过滤状态，才能知道哪些 merge request 已经合并或关闭
+        kwargs['updated_after'] = cursor
+    return role, list(iter_items(gl.mergerequests, per_page=100, prefetch=True, **kwargs))
+
+
+def refresh(gl: gitlab.Gitlab, path: str = DASHBOARD_CACHE_PATH, full: bool = False) -> dict:
+    """
+    刷新缓存
+    :param gl: gitlab 实例
+    :param path: 缓存路径
+    :param full: 是否忽略游标全量刷新
+    :return: 缓存内容，mrs 为 merge request id -> 信息
+    """
+    cache = load_cache(path)
+    if full or time.time() - cache.get('full_refreshed_at', 0) > FULL_REFRESH_INTERVAL:
+        cache = {'username': cache.get('username')}
+    if cache.get('username') is None:
+        gl.auth()
+        cache['username'] = gl.user.username
+
+    cursor: str | None = cache.get('cursor')
+    mrs: dict[str, dict] = cache.setdefault('mrs', {})
+    queries = get_role_queries(cache['username'])
+    # 每种身份一次查询，并发请求
+    with ThreadPoolExecutor(max_workers=len(queries)) as executor:
+        results = list(executor.map(lambda item: fetch_role(gl, item[0], item[1], cursor), queries.items()))
+
+    for role, items in results:
+        debugPrint(role, '返回', len(items), '个 merge request')
+        for mr in items:
+            key = str(mr.id)
+            if mr.state != 'opened':
+                mrs.pop(key, None)
+            else:
+                info = mrs.setdefault(key, {'roles': []})
+                info.update({'project': mr.references['full'].rsplit('!', 1)[0],
+                             'iid': mr.iid,
+                             'title': mr.title,
+                             'target_branch': mr.target_branch,
+                             'web_url': mr.web_url,
+                             'draft': getattr(mr, 'draft', False),
+                             'updated_at': mr.updated_at})
+                if role not in info['roles']:
+                    info['roles'].append(role)
+            cursor = later(cursor, mr.updated_at)
+
+    cache['cursor'] = cursor
+    if 'full_refreshed_at' not in cache:
+        cache['full_refreshed_at'] = time.time()
+    save_cache(cache, path)
+    return cache
+
+
+def render(mrs: dict[str, dict]):
+    """
+    按仓库、目标分支分组输出
+    """
+    if len(mrs) == 0:
+        print_step('没有未合并的 merge request')
+        return
+    groups: dict[str, dict[str, list[dict]]] = {}
+    for info in sorted(mrs.values(), key=lambda x: x['updated_at'], reverse=True):
+        groups.setdefault(info['project'], {}).setdefault(info['target_branch'], []).append(info)
+
+    print_step(f'共 {len(mrs)} 个未合并的 merge request')
+    for project in sorted(groups.keys()):
+        print(Colors.BOLD + project + Colors.ENDC)
+        for target_branch, items in groups[project].items():
+            print(f'  → {Colors.OK_CYAN}{target_branch}{Colors.ENDC}')
+            for info in items:
+                roles = '/'.join(ROLE_NAMES[role] for role in info['roles'])
+                draft = '[Draft] ' if info.get('draft') else ''
+                print(f'    !{info["iid"]:<6} {draft}{info["title"][:60]:<60}  {roles:<12} '
+                      f'{info["updated_at"][:10]}  {info["web_url"]}')
+
+
+def show_dashboard(gl: gitlab.Gitlab, full: bool = False):
+    start = time.perf_counter()
+    cache = refresh(gl, full=full)
+    debugPrint('刷新耗时', round(time.perf_counter() - start, 2), 's')
+    render(cache['mrs'])
@@ -0,0 +1,240 @@
+#  Copyright (c) 2023, Guanghui Liang. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""
+跟踪脚本创建的 merge request，输出状态、pipeline、approval 的变化。
+
+每个 project 每轮只请求一次 merge request 列表（iids[] 批量过滤 + updated_after 游标）和一次 pipeline 列表，
+approval 不一定会更新 updated_at，每个未结束的 merge request 单独请求一次。
+游标和最近一次看到的状态保存在 watched_merge_requests.json 中，重新启动后从上次的游标继续。
+"""
+
+from __future__ import annotations
+
+import fcntl
+import json
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import TYPE_CHECKING
+from Utils import debugPrint, get_root_path, print_step, Colors, later
+from gitlab_pager import iter_items, first_item
+
+if TYPE_CHECKING:
+    import gitlab
+    from gitlab.v4.objects.projects import Project
+    from gitlab.v4.objects import ProjectMergeRequest
+
+WATCH_STATE_PATH: str = os.path.join(get_root_path(), 'watched_merge_requests.json')
+# 已经结束的 merge request 不再跟踪
+FINISHED_STATES: [str] = ['merged', 'closed']
+# iids[] 每批数量，和每页最大数量一致
+IIDS_BATCH_SIZE: int = 100
+DEFAULT_INTERVAL: int = 30
+
+
+def load_watch_state(path: str = WATCH_STATE_PATH) -> dict:
+    """
+    :return: project id -> {'mr_cursor', 'pipeline_cursor', 'mrs': {iid -> 最近一次的状态}}
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def save_watch_state(state: dict, path: str = WATCH_STATE_PATH):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.watched_')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(state, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+@contextmanager
+def watch_state_lock(path: str = WATCH_STATE_PATH):
+    """
+    状态文件的读取、修改、写入需要在锁内完成，--watch 运行期间创建的 merge request 不会被覆盖
+    """
+    with open(path + '.lock', 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def track_merge_request(project_id: int, mr_url: str, path: str = WATCH_STATE_PATH):
+    """
+    记录创建的 merge request，之后通过 --watch 跟踪
+    :param project_id: merge request 所在的 project id
+    :param mr_url: merge request 链接，最后一段为 iid
+    """
+    with watch_state_lock(path):
+        state = load_watch_state(path)
+        entry = state.setdefault(str(project_id), {'mr_cursor': None, 'pipeline_cursor': None, 'mrs': {}})
+        entry['mrs'].setdefault(mr_url.strip().split('/')[-1], {'url': mr_url.strip()})
+        save_watch_state(state, path)
+
+
+def format_change(name: str, old: object, new: object) -> str:
+    return f'{name}: {old if old is not None else "-"} → {new if new is not None else "-"}'
+
+
+class MergeRequestWatcher:
+
+    def __init__(self, gl: gitlab.Gitlab, path: str = WATCH_STATE_PATH):
+        self.gitlab = gl
+        self.path = path
+        self.state: dict = load_watch_state(path)
+        # 已经结束、不再跟踪的 (project id, iid)，合并文件内容时不再加回来
+        self.dropped: set[(str, str)] = set()
+
+    def merge_new_entries(self, state: dict):
+        """
+        合并文件中新记录的 project 和 merge request（--watch 运行期间由 track_merge_request 写入）
+        """
+        for project_id, entry in state.items():
+            current = self.state.get(project_id)
+            for iid, snapshot in entry['mrs'].items():
+                if (project_id, iid) in self.dropped:
+                    continue
+                if current is None:
+                    current = self.state.setdefault(project_id, {'mr_cursor': None, 'pipeline_cursor': None,
+                                                                 'mrs': {}})
+                current['mrs'].setdefault(iid, snapshot)
+
+    def save(self):
+        with watch_state_lock(self.path):
+            self.merge_new_entries(load_watch_state(self.path))
+            save_watch_state(self.state, self.path)
+
+    def poll(self) -> int:
+        """
+        检查所有 project 一轮
+        :return: 有变化的 merge request 数量
+        """
+        with watch_state_lock(self.path):
+            self.merge_new_entries(load_watch_state(self.path))
+        changed_count = 0
+        for project_id in list(self.state.keys()):
+            entry = self.state[project_id]
+            try:
+                changed_count += self.poll_project(int(project_id), entry)
+            except Exception as e:
+                print_step(f'⚠️ project {project_id} 获取失败: {e}')
+                continue
+            if all(mr.get('state') in FINISHED_STATES for mr in entry['mrs'].values()):
+                self.dropped.update((project_id, iid) for iid in entry['mrs'])
+                del self.state[project_id]
+            # 每个 project 处理完就保存，中断后不会重复输出
+            self.save()
+        return changed_count
+
+    def poll_project(self, project_id: int, entry: dict) -> int:
+        # lazy=True 不请求 project 详情，只用来拼接口路径
+        project: Project = self.gitlab.projects.get(project_id, lazy=True)
+        snapshots: dict[str, dict] = entry['mrs']
+        changes: dict[str, [str]] = {}
+
+        open_iids = [iid for iid, mr in snapshots.items() if mr.get('state') not in FINISHED_STATES]
+        for start in range(0, len(open_iids), IIDS_BATCH_SIZE):
+            kwargs = {'iids': [int(iid) for iid in open_iids[start:start + IIDS_BATCH_SIZE]]}
+            if entry.get('mr_cursor') is not None:
+                kwargs['updated_after'] = entry['mr_cursor']
+            for mr in iter_items(project.mergerequests, per_page=IIDS_BATCH_SIZE, **kwargs):
+                changes.setdefault(str(mr.iid), []).extend(self.update_merge_request(mr, snapshots[str(mr.iid)]))
+                entry['mr_cursor'] = later(entry.get('mr_cursor'), mr.updated_at)
+
+        if entry.get('pipeline_cursor') is None:
+            # 第一次跟踪时 pipeline 状态已经在 update_merge_request 中获取
+            entry['pipeline_cursor'] = entry.get('mr_cursor')
+        else:
+            shas = {mr.get('sha'): iid for iid, mr in snapshots.items()
+                    if mr.get('state') not in FINISHED_STATES and mr.get('sha') is not None}
+            seen: set[str] = set()
+            # 默认按 id 倒序，同一个 sha 只取最新的 pipeline
+            for pipeline in iter_items(project.pipelines, per_page=100, updated_after=entry['pipeline_cursor']):
+                entry['pipeline_cursor'] = later(entry['pipeline_cursor'], pipeline.updated_at)
+                iid = shas.get(pipeline.sha)
+                if iid is None or pipeline.sha in seen:
+                    continue
+                seen.add(pipeline.sha)
+                snapshot = snapshots[iid]
+                if snapshot.get('pipeline') != pipeline.status:
+                    changes.setdefault(iid, []).append(format_change('pipeline', snapshot.get('pipeline'),
+                                                                     pipeline.status))
+                    snapshot['pipeline'] = pipeline.status
+
+        for iid, snapshot in snapshots.items():
+            if snapshot.get('state') not in FINISHED_STATES:
+                changes.setdefault(iid, []).extend(self.update_approvals(project, iid, snapshot))
+
+        for iid, lines in changes.items():
+            if len(lines) > 0:
+                print_step(Colors.OK_BLUE + snapshots[iid]['url'] + Colors.ENDC)
+                for line in lines:
+                    print(f'    {line}')
+        return len([lines for lines in changes.values() if len(lines) > 0])
+
+    @classmethod
+    def update_merge_request(cls, mr: ProjectMergeRequest, snapshot: dict) -> [str]:
+        """
+        和上次的状态比较，返回变化并更新 snapshot
+        """
+        changes: [str] = []
+        if snapshot.get('state') != mr.state:
+            changes.append(format_change('状态', snapshot.get('state'), mr.state))
+            snapshot['state'] = mr.state
+
+        # 新跟踪的 merge request 或者有新的提交时，重新获取 pipeline
+        if snapshot.get('sha') != mr.sha:
+            snapshot['sha'] = mr.sha
+            pipeline = first_item(mr.pipelines, per_page=1)
+            status = pipeline.status if pipeline is not None else None
+            if snapshot.get('pipeline') != status:
+                changes.append(format_change('pipeline', snapshot.get('pipeline'), status))
+                snapshot['pipeline'] = status
+
+        debugPrint('merge request', mr.web_url, '检查完成')
+        return changes
+
+    @classmethod
+    def update_approvals(cls, project: Project, iid: str, snapshot: dict) -> [str]:
+        """
+        获取 approval 并和上次比较。gitlab 不保证 approval 会更新 merge request 的 updated_at，
+        所以每轮都直接请求所有未结束的 merge request
+        """
+        approvals = project.mergerequests.get(int(iid), lazy=True).approvals.get()
+        approved_by = sorted(user['user']['username'] for user in approvals.approved_by)
+        if snapshot.get('approved_by', []) == approved_by:
+            return []
+        changes = [format_change('approved by', ', '.join(snapshot.get('approved_by', [])) or None,
+                                 ', '.join(approved_by) or None)]
+        snapshot['approved_by'] = approved_by
+        return changes
+
+    def run(self, interval: int = DEFAULT_INTERVAL, once: bool = False):
+        if len(self.state) == 0:
+            print_step('没有需要跟踪的 merge request')
+            return
+        print_step(f'开始跟踪 {sum(len(entry["mrs"]) for entry in self.state.values())} 个 merge request，'
+                   f'每 {interval} 秒检查一次，Ctrl+C 结束')
+        while True:
+            self.poll()
+            if once or len(self.state) == 0:
+                break
+            time.sleep(interval)
+        if len(self.state) == 0:
+            print_step('所有 merge request 都已结束')
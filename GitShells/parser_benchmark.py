@@ -0,0 +1,260 @@
+#  Copyright (c) 2023, Guanghui Liang. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""
+Podfile 解析、diff 提取、push log 解析等纯 python 逻辑的性能检测。
+
+用法:
+    python3 parser_benchmark.py                   # 运行并和保存的基线比较
+    python3 parser_benchmark.py --save-baseline   # 运行并保存为新的基线
+    python3 parser_benchmark.py --filter pod_commit  # 只运行名字包含 pod_commit 的用例
+
+每个用例输出 ops/sec 和单次执行的内存分配峰值，比基线慢超过阈值时以非 0 状态码退出。
+"""
+
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import namedtuple
+from typing import Callable
+from Utils import get_root_path, print_step, Colors, get_mr_url_from_local_log, search_file_path
+from commit_helper import CommitHelper
+from createMR import MRHelper
+from podfile_parser import parse_pod_commit_spans, get_pod_commits
+
+BASELINE_PATH: str = os.path.join(get_root_path(), 'parser_benchmark_baseline.json')
+# 比基线慢多少认为是性能退化
+REGRESSION_THRESHOLD: float = 0.2
+# 每个用例最少运行时间，单位秒
+MIN_RUN_TIME: float = 0.2
+POD_COUNTS: [int] = [50, 500, 2000]
+
+BenchmarkResult = namedtuple('BenchmarkResult', ['name', 'ops_per_sec', 'peak_bytes'])
+
+
+class FixtureBlob:
+    """
+    模拟 git blob，只提供 data_stream，避免基准测试受磁盘和 git 进程影响
+    """
+
+    def __init__(self, text: str, path: str = 'Podfile'):
+        self.data = text.encode()
+        self.path = path
+        self.name = os.path.basename(path)
+
+    @property
+    def data_stream(self):
+        return io.BytesIO(self.data)
+
+
+class FixtureDiff:
+    def __init__(self, a_text: str, b_text: str, path: str = 'Podfile'):
+        self.a_blob = FixtureBlob(a_text, path)
+        self.b_blob = FixtureBlob(b_text, path)
+
+
+class FixtureCommit:
+    """
+    模拟 git commit，提供 CommitHelper.get_changed_lines 用到的 diff、parents、tree
+    """
+
+    def __init__(self, files: dict[str, str], parent: 'FixtureCommit | None' = None):
+        self.tree = {path: FixtureBlob(text, path) for path, text in files.items()}
+        self.parents = [parent] if parent is not None else []
+
+    def diff(self, other: 'FixtureCommit') -> [FixtureDiff]:
+        return [FixtureDiff(other.tree[path].data.decode(), blob.data.decode(), path)
+                for path, blob in self.tree.items()
+                if path in other.tree and other.tree[path].data != blob.data]
+
+
+def make_commit_hash(seed: int) -> str:
+    return f'{seed * 2654435761 % (1 << 160):040x}'
+
+
+def make_podfile(pod_count: int, def_style: bool, seed: int = 0) -> str:
+    """
+    生成 Podfile
+    :param pod_count: 组件库数量
+    :param def_style: 是否使用 def 函数写法
+    :param seed: 用于生成不同的 commit hash
+    :return: Podfile 内容
+    """
+    lines: [str] = ["platform :ios, '12.0'", '', "target 'App' do"]
+    defs: [str] = []
+    for index in range(pod_count):
+        name = f'KEPModule{index}'
+        commit = make_commit_hash(index + seed)
+        url = f'git@gitlab.gotokeep.com:ios/app/fd/{name}.git'
+        if def_style:
+            method = f'{name.lower()}_commit'
+            defs.extend([f'def {method}', f'  "{commit}"', 'end', ''])
+            lines.append(f"  pod '{name}', :git => '{url}', :commit => {method}")
+        else:
+            lines.append(f"  pod '{name}', :git => '{url}', :commit => '{commit}'")
+    lines.append('end')
+    return '\n'.join(defs + lines) + '\n'
+
+
+def make_push_log(line_count: int) -> str:
+    lines = [f'Enumerating objects: {index}, done.' for index in range(line_count)]
+    lines.extend(['remote:',
+                  'remote: View merge request for user/mr1690000000:',
+                  'remote:   https://gitlab.gotokeep.com/ios/app/-/merge_requests/12345',
+                  'remote:'])
+    return '\n'.join(lines) + '\n'
+
+
+def make_tree(root: str, dir_count: int, files_per_dir: int):
+    """
+    生成目录树，Podfile 放在最后遍历到的目录中
+    """
+    for index in range(dir_count):
+        folder = os.path.join(root, f'Module{index % 50}', f'Sources{index}')
+        os.makedirs(folder, exist_ok=True)
+        for file_index in range(files_per_dir):
+            open(os.path.join(folder, f'File{file_index}.swift'), 'w').close()
+    podfile_dir = os.path.join(root, 'zzz')
+    os.makedirs(podfile_dir, exist_ok=True)
+    with open(os.path.join(podfile_dir, 'Podfile'), 'w') as f:
+        f.write(make_podfile(10, def_style=False))
+
+
+def measure(name: str, func: Callable[[], object]) -> BenchmarkResult:
+    func()  # 预热
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    count = 0
+    start = time.perf_counter()
+    elapsed = 0.0
+    while elapsed < MIN_RUN_TIME:
+        func()
+        count += 1
+        elapsed = time.perf_counter() - start
+    return BenchmarkResult(name, count / elapsed, peak)
+
+
+def build_cases(workdir: str) -> [(str, Callable[[], object])]:
+    cases: [(str, Callable[[], object])] = []
+
+    for pod_count in POD_COUNTS:
+        for def_style in [False, True]:
+            style = 'def' if def_style else 'git'
+            old_podfile = make_podfile(pod_count, def_style)
+            new_podfile = make_podfile(pod_count, def_style, seed=1)
+            diff = FixtureDiff(old_podfile, new_podfile)
+            # 主工程和 Example 中的 Podfile，和 createMR 中 get_branches_files_diffs 的结果一致
+            diffs = [diff, FixtureDiff(old_podfile, new_podfile, 'Example/Podfile')]
+            parent = FixtureCommit({'Podfile': old_podfile, 'Example/Podfile': old_podfile})
+            commit = FixtureCommit({'Podfile': new_podfile, 'Example/Podfile': new_podfile}, parent)
+            changed_lines = CommitHelper.get_diff_changed_lines(diff)
+
+            podfile_dir = os.path.join(workdir, f'podfile_{style}_{pod_count}')
+            os.makedirs(podfile_dir)
+            with open(os.path.join(podfile_dir, 'Podfile'), 'w') as f:
+                f.write(new_podfile)
+
+            def parse_changed_lines(lines=changed_lines, folder=podfile_dir):
+                # def 写法需要从当前目录搜索 Podfile
+                os.chdir(folder)
+                for line in lines[:50]:
+                    MRHelper.get_commit_and_name_from_changed_line(line)
+
+            cases.extend([
+                (f'get_commit_and_name_from_changed_line[{style}-{pod_count}]', parse_changed_lines),
+                (f'get_diff_changed_lines[{style}-{pod_count}]',
+                 lambda d=diff: CommitHelper.get_diff_changed_lines(d)),
+                (f'get_pod_commits[{style}-{pod_count}]',
+                 lambda text=new_podfile: get_pod_commits(text)),
+                (f'get_changed_pod_commits[{style}-{pod_count}]',
+                 lambda d=diffs: MRHelper.get_changed_pod_commits(d)),
+                (f'get_changed_lines[{style}-{pod_count}]',
+                 lambda c=commit: CommitHelper.get_changed_lines(c, 'Podfile')),
+                (f'parse_pod_commit_spans[{style}-{pod_count}]',
+                 lambda text=new_podfile: parse_pod_commit_spans(text)),
+            ])
+
+    for line_count in [100, 10000]:
+        log_path = os.path.join(workdir, f'mrLog_{line_count}.txt')
+        with open(log_path, 'w') as f:
+            f.write(make_push_log(line_count))
+        cases.append((f'get_mr_url_from_local_log[{line_count}]', lambda p=log_path: get_mr_url_from_local_log(p)))
+
+    tree_dir = os.path.join(workdir, 'tree')
+    make_tree(tree_dir, dir_count=500, files_per_dir=10)
+
+    def search_in_tree():
+        os.chdir(tree_dir)
+        search_file_path('Podfile')
+
+    cases.append(('search_file_path[5000-files]', search_in_tree))
+    return cases
+
+
+def compare_with_baseline(results: [BenchmarkResult], baseline: dict[str, dict]) -> bool:
+    passed = True
+    for result in results:
+        base = baseline.get(result.name)
+        line = f'{result.name:<56} {result.ops_per_sec:>12.1f} ops/s {result.peak_bytes / 1024:>10.1f} KiB'
+        if base is None:
+            print(line)
+            continue
+        change = result.ops_per_sec / base['ops_per_sec'] - 1
+        if change < -REGRESSION_THRESHOLD:
+            print(Colors.FAIL + f'{line}  {change:+.0%} 性能退化' + Colors.ENDC)
+            passed = False
+        else:
+            print(f'{line}  {change:+.0%}')
+    return passed
+
+
+def main(save_baseline: bool, name_filter: str = '') -> bool:
+    cwd = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix='parser_benchmark_')
+    try:
+        cases = [case for case in build_cases(workdir) if name_filter in case[0]]
+        results = [measure(name, func) for name, func in cases]
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    baseline: dict[str, dict] = {}
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH, 'r') as f:
+            baseline = json.load(f)
+    passed = compare_with_baseline(results, {} if save_baseline else baseline)
+
+    if save_baseline:
+        baseline.update({result.name: {'ops_per_sec': result.ops_per_sec, 'peak_bytes': result.peak_bytes}
+                         for result in results})
+        with open(BASELINE_PATH, 'w') as f:
+            json.dump(baseline, f, indent=2)
+        print_step(f'基线已保存到 {BASELINE_PATH}')
+    elif len(baseline) == 0:
+        print_step('没有找到基线，可以使用 --save-baseline 保存')
+    return passed
+
+
+if __name__ == '__main__':
+    _filter = sys.argv[sys.argv.index('--filter') + 1] if '--filter' in sys.argv else ''
+    if not main(save_baseline='--save-baseline' in sys.argv, name_filter=_filter):
+        raise SystemExit(1)
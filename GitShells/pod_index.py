@@ -0,0 +1,224 @@
+#  Copyright (c) 2023, Guanghui Liang. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""
+所有 group 仓库的 podspec 索引（组件名、版本、最低支持版本、依赖）以及 iOS 相关文件的路径。
+
+用法:
+    python3 pod_index.py          # 增量更新，只处理 last_activity_at 变化的仓库
+    python3 pod_index.py --full   # 全量重建，同时清理已删除的仓库
+
+project 列表按 last_activity_at 倒序请求，遇到比上次更新时间更早的仓库即停止；
+有变化的仓库并发获取文件树和 podspec 内容。
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+import sys
+import tempfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING
+from Utils import debugPrint, get_root_path, print_step, log, WARNING, parse_time
+from gitlab_pager import iter_items
+
+if TYPE_CHECKING:
+    import gitlab
+    from gitlab.v4.objects.projects import Project
+
+POD_INDEX_PATH: str = os.path.join(get_root_path(), 'pod_index.json')
+# 记录路径的文件，路径包含其中任意一个关键字即可
+INDEXED_FILE_KEYWORDS: [str] = ['.podspec', '.pbxproj', 'Podfile']
+MAX_WORKER_COUNT: int = 8
+
+PODSPEC_NAME_RE = re.compile(r"\.name\s*=\s*['\"]([^'\"]+)['\"]")
+PODSPEC_VERSION_RE = re.compile(r"\.version\s*=\s*['\"]([^'\"]+)['\"]")
+PODSPEC_DEPLOYMENT_TARGET_RE = re.compile(r"ios\.deployment_target\s*=\s*['\"]([^'\"]+)['\"]")
+PODSPEC_DEPENDENCY_RE = re.compile(r"\.dependency\s+['\"]([^'\"]+)['\"]")
+
+
+def parse_podspec(content: str) -> dict:
+    """
+    解析 podspec 中的组件名、版本、最低支持版本和依赖，subspec 的依赖合并到主组件
+    :param content: podspec 内容
+    :return: {'name', 'version', 'deployment_target', 'dependencies'}
+    """
+    lines = [line for line in content.splitlines() if not line.strip().startswith('#')]
+    content = '\n'.join(lines)
+    name = PODSPEC_NAME_RE.search(content)
+    version = PODSPEC_VERSION_RE.search(content)
+    deployment_target = PODSPEC_DEPLOYMENT_TARGET_RE.search(content)
+    name = name.group(1) if name is not None else ''
+    dependencies: [str] = []
+    for result in PODSPEC_DEPENDENCY_RE.finditer(content):
+        # 'Pod/Subspec' 只保留组件名，忽略对自身 subspec 的依赖
+        dependency = result.group(1).split('/')[0]
+        if dependency != name and dependency not in dependencies:
+            dependencies.append(dependency)
+    return {'name': name,
+            'version': version.group(1) if version is not None else '',
+            'deployment_target': deployment_target.group(1) if deployment_target is not None else '',
+            'dependencies': dependencies}
+
+
+def index_project(project: Project) -> dict:
+    """
+    获取单个仓库的文件树和 podspec
+    :param project: gitlab project
+    :return: 索引信息
+    """
+    items: [dict] = project.repository_tree(ref=project.default_branch, recursive=True, get_all=True)
+    files = [item['path'] for item in items
+             if item['type'] == 'blob' and any(keyword in item['path'] for keyword in INDEXED_FILE_KEYWORDS)]
+    podspecs: [dict] = []
+    for path in files:
+        # Pods 目录中的是三方库的 podspec，不是仓库自己的组件
+        if not path.endswith('.podspec') or path.startswith('Pods/') or '/Pods/' in path:
+            continue
+        content: bytes = project.files.raw(file_path=path, ref=project.default_branch)
+        podspec = parse_podspec(content.decode('utf-8', errors='ignore'))
+        podspec['path'] = path
+        podspecs.append(podspec)
+    debugPrint('索引仓库', project.path_with_namespace, '完成，podspec', len(podspecs), '个')
+    return {'name': project.name,
+            'path_with_namespace': project.path_with_namespace,
+            'default_branch': project.default_branch,
+            'last_activity_at': project.last_activity_at,
+            'files': files,
+            'podspecs': podspecs}
+
+
+class PodIndex:
+
+    def __init__(self, path: str = POD_INDEX_PATH):
+        self.path = path
+        self.data: dict = {'cursor': None, 'projects': {}}
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                self.data = json.load(f)
+
+    @property
+    def projects(self) -> dict[str, dict]:
+        """
+        project id（字符串）-> 索引信息
+        """
+        return self.data['projects']
+
+    def is_empty(self) -> bool:
+        return len(self.projects) == 0
+
+    def save(self):
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path), prefix='.pod_index_')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(self.data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def refresh(self, gl: gitlab.Gitlab, full: bool = False) -> int:
+        """
+        更新索引
+        :param gl: gitlab 实例
+        :param full: 是否全量重建
+        :return: 更新的仓库数量
+        """
+        cursor: str | None = None if full else self.data.get('cursor')
+        newest: str | None = None
+        seen_ids: set[str] = set()
+        changed: [Project] = []
+        for project in iter_items(gl.projects, per_page=100, prefetch=True,
+                                  order_by='last_activity_at', sort='desc', archived=False):
+            if newest is None:
+                newest = project.last_activity_at
+            if cursor is not None and parse_time(project.last_activity_at) < parse_time(cursor):
+                break
+            # 只索引 group 下的仓库，空仓库没有默认分支
+            if project.namespace.get('kind') != 'group' or project.default_branch is None:
+                continue
+            seen_ids.add(str(project.id))
+            entry = self.projects.get(str(project.id))
+            if entry is None or entry['last_activity_at'] != project.last_activity_at:
+                changed.append(project)
+
+        print_step(f'{len(changed)} 个仓库需要更新索引')
+
+        def safe_index(project: Project) -> (Project, dict | None):
+            try:
+                return project, index_project(project)
+            except Exception as e:
+                log(WARNING, '索引仓库', project.path_with_namespace, '失败:', e)
+                return project, None
+
+        failed_count = 0
+        with ThreadPoolExecutor(max_workers=MAX_WORKER_COUNT) as executor:
+            for project, entry in executor.map(safe_index, changed):
+                if entry is not None:
+                    self.projects[str(project.id)] = entry
+                else:
+                    failed_count += 1
+
+        if full:
+            for project_id in [project_id for project_id in self.projects if project_id not in seen_ids]:
+                del self.projects[project_id]
+        # 有仓库失败时不移动游标，下次增量更新会重新处理
+        if newest is not None and failed_count == 0:
+            self.data['cursor'] = newest
+        self.save()
+        return len(changed)
+
+    def get_fresh_entry(self, project_id: int, last_activity_at: str) -> dict | None:
+        """
+        获取和线上一致的索引信息，仓库有新的改动时返回 None
+        """
+        entry = self.projects.get(str(project_id))
+        if entry is None or entry['last_activity_at'] != last_activity_at:
+            return None
+        return entry
+
+    def get_transitive_dependents(self, project_names: [str]) -> dict[str, str]:
+        """
+        获取直接或间接依赖了指定仓库的所有仓库
+        :param project_names: 仓库名
+        :return: 依赖方仓库名 -> 它依赖的仓库名（离指定仓库最近的一层）
+        """
+        pods_by_project: dict[str, set[str]] = {}
+        dependents_by_pod: dict[str, set[str]] = {}
+        for entry in self.projects.values():
+            for podspec in entry['podspecs']:
+                pods_by_project.setdefault(entry['name'], set()).add(podspec['name'])
+                for dependency in podspec['dependencies']:
+                    dependents_by_pod.setdefault(dependency, set()).add(entry['name'])
+
+        result: dict[str, str] = {}
+        visited: set[str] = set(project_names)
+        pending = deque(project_names)
+        while len(pending) > 0:
+            name = pending.popleft()
+            for pod in pods_by_project.get(name, set()):
+                for dependent in sorted(dependents_by_pod.get(pod, set())):
+                    if dependent not in visited:
+                        visited.add(dependent)
+                        result[dependent] = name
+                        pending.append(dependent)
+        return result
+
+
+if __name__ == '__main__':
+    import gitlab
+
+    _gitlab = gitlab.Gitlab.from_config('Keep', [get_root_path() + '/MRConfig.ini'])
+    _index = PodIndex()
+    _count = _index.refresh(_gitlab, full='--full' in sys.argv or _index.is_empty())
+    print_step(f'索引更新完成，共 {len(_index.projects)} 个仓库，本次更新 {_count} 个')
@@ -0,0 +1,173 @@
+#  Copyright (c) 2023, Guanghui Liang. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""
+组件库本地镜像。
+
+为 Podfile 中的组件库维护不下载文件内容的 bare 仓库（--filter=blob:none），
+通过本地 git 历史中的 merge commit（"See merge request group/repo!123"）找到 commit 对应的 merge request，不需要请求接口。
+
+用法:
+    python3 pod_mirror.py    # 在主工程目录执行，创建或并发更新当前仓库所有 Podfile 中组件库的镜像
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from Utils import debugPrint, get_root_path, print_step, search_file_paths, log, WARNING
+from podfile_parser import parse_pod_commit_spans
+
+MIRROR_ROOT: str = os.path.join(get_root_path(), '.pod_mirrors')
+MAX_WORKER_COUNT: int = 8
+MERGE_REQUEST_RE = re.compile(r'See merge request (\S+?)!(\d+)')
+# 部分 clone 的仓库缺少对象时 git 会自动联网下载，查询时禁止这个行为（git >= 2.44 支持）
+OFFLINE_ENV: dict = dict(os.environ, GIT_NO_LAZY_FETCH='1')
+
+
+class PodMirror:
+
+    def __init__(self, project_name: str, root: str = MIRROR_ROOT):
+        self.project_name = project_name
+        self.path = os.path.join(root, f'{project_name}.git')
+
+    def exists(self) -> bool:
+        return os.path.isdir(self.path)
+
+    def git(self, *args: str, offline: bool = True) -> (int, str):
+        result = subprocess.run(['git', '-C', self.path, *args],
+                                capture_output=True, text=True, env=OFFLINE_ENV if offline else None)
+        return result.returncode, result.stdout
+
+    def sync(self, url: str) -> bool:
+        """
+        创建或增量更新镜像
+        :param url: 组件库仓库地址
+        :return: 是否成功
+        """
+        if not self.exists():
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            result = subprocess.run(['git', 'clone', '--quiet', '--bare', '--filter=blob:none', url, self.path],
+                                    capture_output=True, text=True)
+            if result.returncode != 0:
+                log(WARNING, '创建镜像', self.project_name, '失败:', result.stderr.strip())
+                return False
+            self.git('config', 'remote.origin.fetch', '+refs/heads/*:refs/heads/*')
+            self.git('config', 'core.commitGraph', 'true')
+            self.git('config', 'fetch.writeCommitGraph', 'true')
+            debugPrint('创建镜像', self.project_name)
+            return True
+        code, _ = self.git('fetch', '--quiet', '--prune', 'origin', offline=False)
+        debugPrint('更新镜像', self.project_name, '完成' if code == 0 else '失败')
+        return code == 0
+
+    def has_commit(self, sha: str) -> bool:
+        code, _ = self.git('cat-file', '-e', f'{sha}^{{commit}}')
+        return code == 0
+
+    def is_merged(self, sha: str) -> bool:
+        """
+        sha 是否已经在默认分支（bare 仓库的 HEAD）上
+        """
+        code, _ = self.git('merge-base', '--is-ancestor', sha, 'HEAD')
+        return code == 0
+
+    def get_merge_commits(self, *log_args: str) -> [(str, str, int)]:
+        """
+        从 merge commit 的 message 中解析 merge request
+        :param log_args: git log 参数
+        :return: [(merge commit hash, 仓库路径, merge request iid)]，按提交时间从早到晚
+        """
+        code, output = self.git('log', '--merges', '--reverse', '--format=%H%x01%B%x00', *log_args)
+        if code != 0:
+            return []
+        merge_commits: [(str, str, int)] = []
+        for record in output.split('\0'):
+            merge_sha, _, message = record.strip().partition('\x01')
+            result = MERGE_REQUEST_RE.search(message)
+            if result is not None:
+                merge_commits.append((merge_sha, result.group(1), int(result.group(2))))
+        return merge_commits
+
+    def find_merge_commit(self, sha: str) -> (str, str, int) | None:
+        # sha 之后最早的 merge request merge commit，sha 只在它合入的分支（第二个父提交）上时才是通过它合入的
+        merge_commits = self.get_merge_commits('--ancestry-path', f'{sha}..HEAD')
+        if len(merge_commits) == 0:
+            return None
+        merge_commit = merge_commits[0]
+        in_source, _ = self.git('merge-base', '--is-ancestor', sha, f'{merge_commit[0]}^2')
+        in_target, _ = self.git('merge-base', '--is-ancestor', sha, f'{merge_commit[0]}^1')
+        return merge_commit if in_source == 0 and in_target != 0 else None
+
+    def resolve_commit(self, sha: str) -> (str, int) | None:
+        """
+        找到把 sha 合入默认分支的 merge request
+        :return: (仓库路径, merge request iid)，镜像中没有 sha、还没有合入或者直接提交到默认分支时返回 None
+        """
+        if not self.exists() or not self.has_commit(sha):
+            return None
+        merge_commit = self.find_merge_commit(sha)
+        return merge_commit[1:] if merge_commit is not None else None
+
+    def resolve_range(self, from_sha: str, to_sha: str) -> [(str, int)]:
+        """
+        获取两个 commit 之间合入的所有 merge request，包括之后合入 to_sha 本身的 merge request
+        :return: [(仓库路径, merge request iid)]，镜像中缺少任意一个 commit 时返回空数组
+        """
+        if not self.exists() or not self.has_commit(from_sha) or not self.has_commit(to_sha):
+            return []
+        merge_commits = self.get_merge_commits(f'{from_sha}..{to_sha}')
+        if to_sha not in [merge_sha for merge_sha, _, _ in merge_commits]:
+            merge_commit = self.find_merge_commit(to_sha)
+            if merge_commit is not None:
+                merge_commits.append(merge_commit)
+        merge_requests: [(str, int)] = []
+        for _, path, iid in merge_commits:
+            if (path, iid) not in merge_requests:
+                merge_requests.append((path, iid))
+        return merge_requests
+
+
+def sync_mirrors(urls: dict[str, str], worker_count: int = MAX_WORKER_COUNT) -> int:
+    """
+    并发创建或更新镜像
+    :param urls: 仓库名 -> 仓库地址
+    :param worker_count: 并发数量
+    :return: 成功的数量
+    """
+    with ThreadPoolExecutor(max_workers=worker_count) as executor:
+        results = list(executor.map(lambda item: PodMirror(item[0]).sync(item[1]), urls.items()))
+    return len([result for result in results if result])
+
+
+def get_podfile_pod_urls() -> dict[str, str]:
+    """
+    :return: 当前仓库所有 Podfile 中的组件库，仓库名 -> 仓库地址
+    """
+    urls: dict[str, str] = {}
+    for file_path in search_file_paths('Podfile'):
+        with open(file_path, 'r') as f:
+            for span in parse_pod_commit_spans(f.read()):
+                if "gotokeep" in span.url:
+                    urls.setdefault(span.project_name, span.url)
+    return urls
+
+
+if __name__ == '__main__':
+    _urls = get_podfile_pod_urls()
+    print_step(f'同步 {len(_urls)} 个组件库镜像到 {MIRROR_ROOT}')
+    _count = sync_mirrors(_urls)
+    print_step(f'同步完成，成功 {_count} 个，失败 {len(_urls) - _count} 个')
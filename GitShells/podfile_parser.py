@@ -0,0 +1,108 @@
+#  Copyright (c) 2023, Guanghui Liang. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import re
+from collections import namedtuple
+
+# project_name: 组件库仓库名; commit: commit hash; start/end: commit hash 在 Podfile 中的位置; url: 仓库地址
+PodCommitSpan = namedtuple('PodCommitSpan', ['project_name', 'commit', 'start', 'end', 'url'])
+
+COMMIT_LITERAL_RE = re.compile(r":commit\s*=>\s*(['\"])(.+?)\1")
+COMMIT_METHOD_RE = re.compile(r":commit\s*=>\s*([A-Za-z_]\w*)")
+GIT_URL_RE = re.compile(r":git\s*=>\s*(['\"])(.+?)\1")
+# def method_name
+#   "commit"
+# end
+DEF_COMMIT_RE = re.compile(r"^[ \t]*def[ \t]+([A-Za-z_]\w*)[ \t]*\n[ \t]*(['\"])(.+?)\2", re.MULTILINE)
+
+
+def get_project_name_from_url(url: str) -> str:
+    return url.split('.git')[0].split('/')[-1]
+
+
+def parse_pod_commit_spans(file_data: str) -> [PodCommitSpan]:
+    """
+    解析 Podfile 中每个组件库 commit hash 所在的位置，支持以下两种写法:
+        pod "...", :git => "...", :commit => "..."
+
+        def method
+          "..."
+        end
+        pod "...", :git => "...", :commit => method
+    :param file_data: Podfile 内容
+    :return: 按位置排列的 commit 信息，注释行会被忽略
+    """
+    spans: [PodCommitSpan] = []
+    method_projects: dict[str, (str, str)] = {}
+    offset = 0
+    for line in file_data.splitlines(keepends=True):
+        stripped = line.strip()
+        if stripped.startswith('pod') and not stripped.startswith('#'):
+            url_result = GIT_URL_RE.search(line)
+            if url_result is not None:
+                url = url_result.group(2)
+                project_name = get_project_name_from_url(url)
+                commit_result = COMMIT_LITERAL_RE.search(line)
+                method_result = COMMIT_METHOD_RE.search(line)
+                if commit_result is not None:
+                    spans.append(PodCommitSpan(project_name,
+                                               commit_result.group(2),
+                                               offset + commit_result.start(2),
+                                               offset + commit_result.end(2),
+                                               url))
+                elif method_result is not None:
+                    method_projects.setdefault(method_result.group(1), (project_name, url))
+        offset += len(line)
+
+    for def_result in DEF_COMMIT_RE.finditer(file_data):
+        project = method_projects.get(def_result.group(1))
+        if project is not None:
+            project_name, url = project
+            spans.append(PodCommitSpan(project_name,
+                                       def_result.group(3),
+                                       def_result.start(3),
+                                       def_result.end(3),
+                                       url))
+
+    spans.sort(key=lambda x: x.start)
+    return spans
+
+
+def get_pod_commits(file_data: str) -> dict[str, str]:
+    """
+    获取 Podfile 中每个组件库使用的 commit
+    :param file_data: Podfile 内容
+    :return: 组件库仓库名 -> commit hash，同一个仓库出现多次时以第一次为准
+    """
+    commits: dict[str, str] = {}
+    for span in parse_pod_commit_spans(file_data):
+        commits.setdefault(span.project_name, span.commit)
+    return commits
+
+
+def apply_commit_updates(file_data: str, spans: [PodCommitSpan]) -> str:
+    """
+    按位置一次性替换 commit hash
+    :param file_data: Podfile 内容
+    :param spans: 需要替换的位置，commit 为新的 commit hash
+    :return: 替换后的内容
+    """
+    pieces: [str] = []
+    position = 0
+    for span in sorted(spans, key=lambda x: x.start):
+        pieces.append(file_data[position:span.start])
+        pieces.append(span.commit)
+        position = span.end
+    pieces.append(file_data[position:])
+    return ''.join(pieces)
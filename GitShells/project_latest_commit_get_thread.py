@@ -12,14 +12,20 @@
 #  See the License for the specific language governing permissions and
 #  limitations under the License.
 
+from __future__ import annotations
+
 import threading
 import queue
-from gitlab.v4.objects.projects import Project
+from typing import TYPE_CHECKING
 # from gitlab.v4.objects.commits import ProjectCommit
-from Utils import debugPrint
+from Utils import debugPrint, log, WARNING
+from gitlab_pager import first_item
 from dataclasses import dataclass
 import datetime as dt
 
+if TYPE_CHECKING:
+    from gitlab.v4.objects.projects import Project
+
 
 @dataclass
 class ProjectLatestCommitModel:
@@ -49,23 +55,37 @@ class ProjectLatestCommitGetThread(threading.Thread):
         :param current_commit_hash: 当前 commit hash
         :param to_queue: 数据队列
         """
-        super().__init__()
+        super().__init__(daemon=True)
+        self.cancel_event = threading.Event()
         self.current_commit = current_commit_hash
         self.queue = to_queue
         self.proj = proj
+        # 获取过程中的异常（例如请求超时）
+        self.error: Exception | None = None
+
+    def cancel(self):
+        """
+        超时后调用，线程结束时不再放入结果
+        """
+        self.cancel_event.set()
 
     def run(self) -> None:
-        debugPrint(f"project { self.project_name } 开始获取最新 commit")
-        debugPrint(f"当前线程：{ threading.current_thread().name } project: {self.project_name}")
+        try:
+            self.fetch_latest_commit()
+        except Exception as e:
+            self.error = e
+            log(WARNING, "project", self.project_name, "获取最新 commit 失败:", e)
+
+    def fetch_latest_commit(self):
+        debugPrint("project", self.project_name, "开始获取最新 commit")
+        debugPrint("当前线程：", threading.current_thread().name, "project:", self.project_name)
         since_time = (dt.date.today() - dt.timedelta(days=7)).isoformat()
-        commits = self.proj.commits.list(since=since_time, get_all=False)
-        if len(commits) > 0:
-            latest_commit = commits[0]
+        latest_commit = first_item(self.proj.commits, per_page=1, since=since_time)
+        if latest_commit is not None and not self.cancel_event.is_set():
             latest_commit_hash: str = latest_commit.id
             latest_commit_message: str = str(latest_commit.message).split('\n')[0]
-            debugPrint(f"project { self.project_name } 获取到七天内最新 commit: { latest_commit_hash }")
+            debugPrint("project", self.project_name, "获取到七天内最新 commit:", latest_commit_hash)
             self.queue.put(ProjectLatestCommitModel(current_commit=self.current_commit,
                                                     latest_commit=latest_commit_hash,
                                                     latest_commit_message=latest_commit_message,
                                                     project_name=self.project_name))
-        return
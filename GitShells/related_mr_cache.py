@@ -0,0 +1,79 @@
+#  Copyright (c) 2023, Guanghui Liang. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""
+组件库相关 merge request 的本地缓存。
+
+key 为 "仓库名 原commit..新commit"。区间查询的结果包含之后合入新 commit 的 merge request，
+只有新 commit 已经合入默认分支时结果才不会再变化，由查询线程判断后写入；只拿到 commit 链接（还没有合入）的结果不缓存。
+缓存由 git hook 在后台预先生成（cache_warmer.py），也会在每次查询后更新。
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+import threading
+from Utils import get_root_path
+
+RELATED_MR_CACHE_PATH: str = os.path.join(get_root_path(), 'related_merge_requests.json')
+# 最多保留的条数，超出后删除最早写入的
+MAX_CACHE_SIZE: int = 500
+
+# 同一个进程内多个查询线程同时写入时串行执行
+_cache_lock = threading.Lock()
+
+
+def get_cache_key(project_name: str, commit_hash: str, from_commit_hash: str = '') -> str:
+    return f'{project_name} {from_commit_hash}..{commit_hash}'
+
+
+def load_related_mr_cache(path: str = RELATED_MR_CACHE_PATH) -> dict[str, list[str]]:
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except ValueError:
+        # 写入中途被打断等原因导致文件损坏时当作没有缓存
+        return {}
+
+
+def get_cached_urls(key: str, path: str = RELATED_MR_CACHE_PATH) -> [str]:
+    """
+    :return: 缓存的 merge request 链接，没有缓存时返回空数组
+    """
+    return load_related_mr_cache(path).get(key, [])
+
+
+def cache_urls(key: str, urls: [str], path: str = RELATED_MR_CACHE_PATH):
+    """
+    写入缓存，读取、修改、替换整个文件，只有在链接都是 merge request 时才写入
+    :param key: get_cache_key 生成的 key
+    :param urls: merge request 链接
+    :param path: 缓存路径
+    """
+    if len(urls) == 0 or any('/merge_requests/' not in url for url in urls):
+        return
+    with _cache_lock:
+        cache = load_related_mr_cache(path)
+        cache.pop(key, None)
+        cache[key] = urls
+        for old_key in list(cache.keys())[:max(0, len(cache) - MAX_CACHE_SIZE)]:
+            del cache[old_key]
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.related_merge_requests_')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(cache, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, path)
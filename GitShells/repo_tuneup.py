@@ -0,0 +1,123 @@
+#  Copyright (c) 2023, Guanghui Liang. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""
+大仓库的工作区检查和 git 配置优化。
+"""
+
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from Utils import debugPrint, print_step
+
+# 内置 fsmonitor 守护进程需要的 git 版本，且只支持 macOS 和 Windows
+FSMONITOR_MIN_GIT_VERSION: (int, int) = (2, 37)
+
+
+def has_uncommitted_changes(repo_dir: str) -> bool:
+    """
+    检查是否有未提交的改动（包含未跟踪的文件）。
+    git status 会先计算完整的状态再输出，提前结束进程节省不了时间，所以分两步检查：
+    1. git diff --quiet HEAD 比较已跟踪的文件（包括暂存区），遇到第一处改动就退出；
+    2. 没有改动时再用 git ls-files 列出未跟踪的文件，读到第一行就关闭管道结束进程。
+    仓库开启 untracked cache、fsmonitor 时 git 会自动使用
+    :param repo_dir: 仓库目录
+    :return: 是否有未提交的改动
+    """
+    result = subprocess.run(['git', 'diff', '--quiet', '--no-ext-diff', '--ignore-submodules=dirty', 'HEAD', '--'],
+                            cwd=repo_dir, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    if result.returncode == 1:
+        return True
+    if result.returncode != 0:
+        raise SystemExit(f'⚠️ 检查工作区失败: {result.stderr.decode().strip()}')
+
+    process = subprocess.Popen(['git', 'ls-files', '--others', '--exclude-standard', '--directory',
+                                '--no-empty-directory', '-z'],
+                               cwd=repo_dir,
+                               stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE)
+    try:
+        first = process.stdout.read(1)
+    finally:
+        process.stdout.close()
+        process.kill()
+        _, stderr = process.communicate()
+    if len(first) == 0 and process.returncode not in [0, -9] and len(stderr) > 0:
+        raise SystemExit(f'⚠️ 检查工作区失败: {stderr.decode().strip()}')
+    return len(first) > 0
+
+
+def get_git_version() -> (int, int):
+    output = subprocess.run(['git', 'version'], capture_output=True, text=True).stdout
+    result = re.search(r'(\d+)\.(\d+)', output)
+    return (int(result.group(1)), int(result.group(2))) if result is not None else (0, 0)
+
+
+def measure_check(repo_dir: str, runs: int = 3) -> float:
+    timings: [float] = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        has_uncommitted_changes(repo_dir)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def run_git(repo_dir: str, *args: str) -> bool:
+    debugPrint('git ' + ' '.join(args))
+    result = subprocess.run(['git', *args], cwd=repo_dir, capture_output=True, text=True)
+    if result.returncode != 0:
+        print_step(f'⚠️ git {" ".join(args)} 执行失败: {result.stderr.strip()}')
+    return result.returncode == 0
+
+
+def tune_up(repo_dir: str):
+    """
+    为仓库开启 commit-graph、untracked cache、fsmonitor，并输出优化前后检查工作区的耗时
+    :param repo_dir: 仓库目录
+    """
+    before = measure_check(repo_dir)
+    print_step(f'优化前检查工作区耗时: {before * 1000:.0f}ms')
+
+    if run_git(repo_dir, 'config', 'core.untrackedCache', 'true'):
+        run_git(repo_dir, 'update-index', '--untracked-cache')
+        print_step('已开启 untracked cache')
+
+    if sys.platform in ['darwin', 'win32'] and get_git_version() >= FSMONITOR_MIN_GIT_VERSION:
+        if run_git(repo_dir, 'config', 'core.fsmonitor', 'true'):
+            print_step('已开启 fsmonitor')
+    else:
+        print_step(f'当前系统或 git 版本不支持内置 fsmonitor（需要 macOS/Windows 且 git >= '
+                   f'{".".join(str(x) for x in FSMONITOR_MIN_GIT_VERSION)}），跳过')
+
+    run_git(repo_dir, 'config', 'core.commitGraph', 'true')
+    run_git(repo_dir, 'config', 'fetch.writeCommitGraph', 'true')
+    if run_git(repo_dir, 'commit-graph', 'write', '--reachable', '--changed-paths'):
+        print_step('已生成 commit-graph')
+
+    # 第一次执行会建立缓存，不计入耗时
+    has_uncommitted_changes(repo_dir)
+    after = measure_check(repo_dir)
+    print_step(f'优化后检查工作区耗时: {after * 1000:.0f}ms')
+
+
+if __name__ == '__main__':
+    _repo_dir = subprocess.run(['git', 'rev-parse', '--show-toplevel'],
+                               capture_output=True, text=True).stdout.strip() or os.getcwd()
+    if '--tune' in sys.argv:
+        tune_up(_repo_dir)
+    else:
+        print(has_uncommitted_changes(_repo_dir))
@@ -14,16 +14,39 @@
 # limitations under the License.
 #
 
+# 检查 ShellScripts 仓库是否有更新。
+# git fetch 在后台执行，结果写入文件，下次执行脚本时再输出并更新，不会阻塞 merge request 的创建。
+# 两次检查的最小间隔（秒）可以通过环境变量 SHELL_SCRIPTS_UPDATE_INTERVAL 配置，默认一天。
+
 SHELL_FOLDER=$(dirname "$0")
 
 cd "$SHELL_FOLDER" || exit
 
-changed=0
+interval=${SHELL_SCRIPTS_UPDATE_INTERVAL:-86400}
+timestamp_file=".update_check_timestamp"
+result_file=".update_check_result"
+
+# 上次后台检查的结果
+if [ -f "$result_file" ]; then
+  if [ "$(cat "$result_file")" = "behind" ]; then
+    echo "ShellScripts 仓库有更新，自动更新中..."
+    # 提交已经在上次后台 fetch 下来了，这里不需要访问网络
+    git rebase -q '@{u}' || git rebase --abort > /dev/null 2>&1
+  fi
+  rm -f "$result_file"
+fi
 
-git fetch && git status | grep -q 'use "git pull"' && changed=1
-if [ $changed = 1 ]; then
-    echo "ShellScripts 仓库有更新，自动拉取中...";
-    git pull -r
-#else
-#    echo "Up-to-date"
+now=$(date +%s)
+last=$(cat "$timestamp_file" 2>/dev/null)
+if [[ "$last" =~ ^[0-9]+$ ]] && [ $((now - last)) -lt "$interval" ]; then
+  exit 0
 fi
+echo "$now" > "$timestamp_file"
+
+(
+  if git fetch -q > /dev/null 2>&1 && [ "$(git rev-list --count 'HEAD..@{u}' 2>/dev/null)" -gt 0 ]; then
+    echo "behind" > "$result_file"
+  fi
+) < /dev/null > /dev/null 2>&1 &
+disown 2>/dev/null
+exit 0
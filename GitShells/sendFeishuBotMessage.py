@@ -21,12 +21,17 @@ import pick
 from create_request import post_merge_request_create
 
 
-def send_feishubot_message(merge_request_url: str,
+def send_feishubot_message(merge_request_urls: [str],
                            author: str,
                            message: str,
                            repo_name: str,
-                           target_branch: str,
+                           target_branches: [str],
                            config: MergeRequestConfigModel) -> bool:
+    """
+    发送 merge request 通知，同一次提交合入多个目标分支时只发送一条
+    :param merge_request_urls: merge request 链接，和 target_branches 一一对应
+    :param target_branches: 目标分支
+    """
     answer = make_question('是否让机器人发送 merge request 通知 y/n(回车默认不发送): ', ['n', 'y'])
     if answer == 'n':
         return False
@@ -79,7 +84,7 @@ def send_feishubot_message(merge_request_url: str,
                                 "is_short": True,
                                 "text": {
                                     "tag": "lark_md",
-                                    "content": "🛠️ **合入分支：**\n" + target_branch
+                                    "content": "🛠️ **合入分支：**\n" + "\n".join(target_branches)
                                 }
                             },
                             {
@@ -97,13 +102,14 @@ def send_feishubot_message(merge_request_url: str,
                         "actions": [{
                             "tag": "button",
                             "text": {
-                                "content": "点我查看 merge request :玫瑰:",
+                                "content": "点我查看 merge request :玫瑰:" if len(merge_request_urls) == 1
+                                else f"点我查看 {target_branch} merge request :玫瑰:",
                                 "tag": "lark_md"
                             },
                             "url": merge_request_url,
                             "type": "primary",
                             "value": {}
-                        }],
+                        } for target_branch, merge_request_url in zip(target_branches, merge_request_urls)],
                         "tag": "action"
                     },
                     {
@@ -129,11 +135,12 @@ def send_feishubot_message(merge_request_url: str,
         response = requests.request("POST", config.feishu_bot_webhook, headers=headers, data=body)
         debugPrint('status code: ', response.status_code)
 
-        post_merge_request_create(merge_request_url=merge_request_url,
-                                  bot_message_at_ids=at_openids,
-                                  personal_openid=config.self_open_id,
-                                  bot_webhook_url=config.feishu_bot_webhook,
-                                  author=author)
+        for merge_request_url in merge_request_urls:
+            post_merge_request_create(merge_request_url=merge_request_url,
+                                      bot_message_at_ids=at_openids,
+                                      personal_openid=config.self_open_id,
+                                      bot_webhook_url=config.feishu_bot_webhook,
+                                      author=author)
 
         if response.status_code == 200:
             print('机器人通知发送成功！🎉')
@@ -179,9 +186,9 @@ def pick_at_userid(user_infos: [FeishuUserInfo]) -> [str]:
 if __name__ == '__main__':
     import config_handler
 
-    send_feishubot_message(merge_request_url='https://www.baidu.com',
+    send_feishubot_message(merge_request_urls=['https://www.baidu.com'],
                            author='xiaoliang',
                            message='feature: 腿部动作能力测评腿部动作能力测评腿部动作能力测评腿部动作能力测评腿部动作能力测评',
-                           target_branch="master",
+                           target_branches=["master"],
                            config=config_handler.get_config_model(),
                            repo_name="Keep")
@@ -0,0 +1,92 @@
+#  Copyright (c) 2023, Guanghui Liang. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""
+createMR.py 启动耗时检测，基于 python -X importtime。
+
+用法:
+    python3 startup_benchmark.py [--budget 毫秒] [--runs 次数]
+
+导入 createMR 的耗时超过预算，或者在启动阶段导入了较慢的依赖时，以非 0 状态码退出。
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+from Utils import get_root_path, print_step, Colors
+
+# 默认预算，单位毫秒
+DEFAULT_BUDGET_MS: float = 150
+DEFAULT_RUNS: int = 5
+# 启动阶段不应该导入的依赖，需要在真正用到的地方再导入
+HEAVY_MODULES: [str] = ['gitlab', 'git', 'numpy', 'requests', 'pick', 'dacite', 'readline']
+
+
+def measure_import(module: str) -> (float, dict[str, float]):
+    """
+    在新进程中导入模块，解析 -X importtime 的输出
+    :param module: 模块名
+    :return: 模块累计导入耗时（毫秒），所有被导入模块的累计耗时（毫秒）
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=get_root_path(), capture_output=True, text=True)
+    if result.returncode != 0:
+        raise SystemExit(f'导入 {module} 失败:\n{result.stderr}')
+
+    imported: dict[str, float] = {}
+    for line in result.stderr.splitlines():
+        # import time:       self [us] |  cumulative | imported package
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        parts = line.split('|')
+        try:
+            cumulative = int(parts[1].strip())
+        except ValueError:
+            continue
+        imported[parts[2].strip()] = cumulative / 1000
+    return imported.get(module, 0), imported
+
+
+def main(budget_ms: float, runs: int, module: str = 'createMR') -> bool:
+    timings: [float] = []
+    imported: dict[str, float] = {}
+    for _ in range(runs):
+        elapsed, imported = measure_import(module)
+        timings.append(elapsed)
+    median = statistics.median(timings)
+    print_step(f'导入 {module} 耗时（{runs} 次中位数）: {median:.1f}ms，预算 {budget_ms:.0f}ms')
+
+    passed = True
+    heavy = [name for name in HEAVY_MODULES if name in imported]
+    if len(heavy) > 0:
+        print(Colors.FAIL + f'启动阶段导入了较慢的依赖: {", ".join(heavy)}' + Colors.ENDC)
+        passed = False
+    if median > budget_ms:
+        print(Colors.FAIL + '启动耗时超出预算' + Colors.ENDC)
+        slowest = sorted(imported.items(), key=lambda x: x[1], reverse=True)[:10]
+        for name, cumulative in slowest:
+            print(f'    {cumulative:8.1f}ms  {name}')
+        passed = False
+    if passed:
+        print(Colors.OK_GREEN + '启动耗时检测通过✅' + Colors.ENDC)
+    return passed
+
+
+if __name__ == '__main__':
+    os.chdir(get_root_path())
+    _budget = float(sys.argv[sys.argv.index('--budget') + 1]) if '--budget' in sys.argv else DEFAULT_BUDGET_MS
+    _runs = int(sys.argv[sys.argv.index('--runs') + 1]) if '--runs' in sys.argv else DEFAULT_RUNS
+    if not main(_budget, _runs):
+        raise SystemExit(1)
@@ -16,142 +16,418 @@
 此脚本用于更新 iOS 所有组件库的最低系统支持版本
 """
 
+import json
+import os
 import re
+import subprocess
+import sys
 import gitlab
 import queue
 import threading
+from concurrent.futures import Executor, ProcessPoolExecutor
 from gitlab.v4.objects.projects import Project
-from gitlab.v4.objects import ProjectFile
+from gitlab.v4.objects import ProjectFile, Group
+
+# 复用 GitShells 中的工具
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'GitShells'))
+from gitlab_pager import iter_items, first_item
+from Utils import get_mr_url_from_push_output
+from pod_index import PodIndex
 
 # 改动分支
 FEATURE_BRANCH_NAME: str = "modify_minimum_target"
+COMMIT_MESSAGE: str = 'feature: 调整组件库最低支持版本至 iOS 12'
+MR_TITLE: str = 'feature: 调整组件库最低支持版本至 iOS 12'
+# (文件路径包含的关键字, 正则, 替换内容)
+PODSPEC_RULE = ('.podspec',
+                rb"ios.deployment_target = [\'\"]([1-9]\d?(\.([1-9]?\d)))[\'\"]",
+                b'ios.deployment_target = \'12.0\'')
+XCODEPROJ_RULE = ('.pbxproj',
+                  rb"IPHONEOS_DEPLOYMENT_TARGET = ([1-9]\d?(\.([1-9]?\d)));",
+                  b'IPHONEOS_DEPLOYMENT_TARGET = 12.0;')
+PODFILE_RULE = ('Podfile',
+                rb"platform :ios, [\'\"]([1-9]\d?(\.([1-9]?\d)))[\'\"]",
+                b'platform :ios, \'12.0\'')
+MODIFY_RULES = [PODSPEC_RULE, XCODEPROJ_RULE, PODFILE_RULE]
+# 本地模式 clone 仓库的缓存目录
+CLONE_CACHE_DIR: str = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.clone_cache')
+
+
+# 同时处理的 project 数量，避免开启过多线程，触发警告
+MAX_WORKER_COUNT: int = 9
+# 需要跳过的 group
+IGNORED_GROUP_NAMES: [str] = ['FD Core', 'App', 'SE', 'iOS']
+# 进度记录文件，中断后重新执行时从这里恢复
+JOURNAL_PATH: str = os.path.join(os.path.dirname(os.path.abspath(__file__)), f'{FEATURE_BRANCH_NAME}_journal.json')
+
+# project 处理阶段
+STAGE_BRANCH_CREATED: str = 'branch_created'
+STAGE_FILES_COMMITTED: str = 'files_committed'
+STAGE_MR_OPENED: str = 'mr_opened'
+
+
+def get_modify_rule(path: str) -> tuple | None:
+    for rule in MODIFY_RULES:
+        if rule[0] in path:
+            return rule
+    return None
+
+
+def rewrite_local_file(path: str) -> bool:
+    """
+    本地模式下按规则修改文件，在进程池中执行
+    :param path: 文件路径
+    :return: 文件是否有改动
+    """
+    rule = get_modify_rule(path)
+    if rule is None or not os.path.isfile(path):
+        return False
+    with open(path, 'rb') as f:
+        content = f.read()
+    new_content = re.sub(rule[1], rule[2], content)
+    if new_content == content:
+        return False
+    with open(path, 'wb') as f:
+        f.write(new_content)
+    return True
+
 
+def run_git(cwd: str | None, *args: str) -> str:
+    result = subprocess.run(['git', *args], cwd=cwd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"git {args[0]} 失败: {result.stderr.strip()}")
+    return result.stdout + result.stderr
 
-def list_cut(obj: list, sublist_max_count):
-    return [obj[i:i + sublist_max_count] for i in range(0, len(obj), sublist_max_count)]
+
+class ModifyJournal:
+    """
+    记录每个 project 的处理进度，每次更新都会落盘
+    """
+
+    def __init__(self, path: str = JOURNAL_PATH, restart: bool = False):
+        """
+        初始化进度记录
+        :param path: 记录文件路径
+        :param restart: 是否忽略已有记录，重新开始
+        """
+        self.path = path
+        self.lock = threading.Lock()
+        self.entries: dict[str, dict] = {}
+        if not restart and os.path.exists(path):
+            with open(path, 'r') as f:
+                self.entries = json.load(f)
+
+    def get(self, project_id: int) -> dict:
+        with self.lock:
+            return dict(self.entries.get(str(project_id), {}))
+
+    def update(self, project: Project, stage: str, **kwargs):
+        """
+        更新 project 的处理阶段，并写入文件
+        :param project: gitlab project 实例
+        :param stage: 处理阶段
+        :param kwargs: 其他需要记录的信息，例如 modified、mr_url
+        """
+        with self.lock:
+            entry = self.entries.setdefault(str(project.id), {'name': project.name})
+            entry['stage'] = stage
+            entry.update(kwargs)
+            # 先写临时文件再替换，避免中断时写坏记录文件
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(self.entries, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
 
 
 class MinimumTargetModifierThread(threading.Thread):
+    """
+    常驻的修改线程，不断从输入队列中取出 project 进行修改，直到取到 None
+    """
 
-    @property
-    def project_name(self):
-        return self.proj.attributes['name']
+    def __init__(self, from_queue: queue.Queue, to_queue: queue.Queue, journal: ModifyJournal | None = None,
+                 local_executor: Executor | None = None):
+        """
+        初始化线程
+        :param from_queue: 待处理的 (group 名, project, 需要修改的文件路径) 队列，路径为空时需要获取文件树
+        :param to_queue: 数据队列，输出 (group 名, merge request 链接)
+        :param journal: 进度记录
+        :param local_executor: 本地模式下修改文件使用的进程池，为空时通过 API 修改
+        """
+        super().__init__()
+        self.from_queue = from_queue
+        self.queue = to_queue
+        self.journal = journal
+        self.local_executor = local_executor
+
+    def run(self) -> None:
+        while True:
+            item = self.from_queue.get()
+            if item is None:
+                return
+            group_name, proj, file_paths = item
+            try:
+                if self.local_executor is not None:
+                    url = Modifier.modify_project_local(project=proj, journal=self.journal,
+                                                        executor=self.local_executor)
+                else:
+                    url = Modifier.modify_project(project=proj, journal=self.journal, file_paths=file_paths)
+            except Exception as e:
+                print(f"project {proj.name} 处理失败：{e}")
+                continue
+            if len(url) > 0:
+                self.queue.put((group_name, url))
 
-    def __init__(self, proj: Project, to_queue: queue.Queue):
+
+class GroupProjectsEnumerateThread(threading.Thread):
+    """
+    逐页枚举 group（包含子 group）下的 project，每拿到一页就送入修改队列
+    """
+
+    def __init__(self, modifier: 'Modifier', group: Group, to_queue: queue.Queue):
         """
         初始化线程
-        :param proj: gitlab project 实例
-        :param to_queue: 数据队列
+        :param modifier: Modifier 实例，用于去重
+        :param group: gitlab group 实例
+        :param to_queue: 待处理的 (group 名, project, 需要修改的文件路径) 队列
         """
         super().__init__()
+        self.modifier = modifier
+        self.group = group
         self.queue = to_queue
-        self.proj = proj
 
     def run(self) -> None:
-        url = Modifier.modify_project(project=self.proj)
-        if len(url) > 0:
-            self.queue.put(url)
-        return
+        print(f"正在处理 group: {self.group.name}")
+        try:
+            # iter_items 按页请求，第一页返回后即可开始修改，处理当前页时后台预取下一页
+            for group_project in iter_items(self.group.projects, per_page=100, prefetch=True, include_subgroups=True):
+                if not self.modifier.mark_processed(group_project.id):
+                    continue
+                # group 接口返回的属性已经包含 name、default_branch 等信息，无需再逐个 get project
+                project = Project(self.modifier.gitlab.projects, group_project.attributes)
+                file_paths: [str] | None = None
+                if self.modifier.pod_index is not None:
+                    # 索引和线上一致时直接使用索引中的文件路径，不再获取文件树
+                    entry = self.modifier.pod_index.get_fresh_entry(project.id, project.last_activity_at)
+                    if entry is not None:
+                        if len(entry['files']) == 0:
+                            print(f"project {project.name} 没有需要修改的文件，跳过")
+                            continue
+                        file_paths = entry['files']
+                self.queue.put((self.group.name, project, file_paths))
+        except Exception as e:
+            print(f"group {self.group.name} 枚举 project 失败：{e}")
 
 
 class Modifier:
-    def __init__(self):
+    def __init__(self, restart: bool = False, local: bool = False, use_index: bool = False):
+        """
+        :param restart: 是否忽略上次的进度记录
+        :param local: 是否使用本地 clone 模式，在本地修改文件后一次 push，减少 API 调用
+        :param use_index: 是否使用 pod 依赖索引跳过没有相关文件的仓库，并省去获取文件树
+        """
         token = input("请输入 Gitlab token: ")
         self.gitlab = gitlab.Gitlab(url="https://gitlab.gotokeep.com", private_token=token)
         # self.gitlab = gitlab.Gitlab.from_config('Keep', [search_shell_file_path('MRConfig.ini')])
         # self.projects: [Project] = self.gitlab.projects.list(get_all=True)
+        self.processed_proj_ids: set[int] = set()
+        self.processed_lock = threading.Lock()
+        self.journal = ModifyJournal(restart=restart)
+        self.local = local
+        self.pod_index: PodIndex | None = PodIndex() if use_index else None
+
+    def mark_processed(self, project_id: int) -> bool:
+        """
+        标记 project 已处理
+        :param project_id: project id
+        :return: 之前没有处理过返回 True，已处理过返回 False
+        """
+        with self.processed_lock:
+            if project_id in self.processed_proj_ids:
+                return False
+            self.processed_proj_ids.add(project_id)
+            return True
 
     def start(self):
-        groups = self.gitlab.groups.list()
+        if self.pod_index is not None:
+            self.pod_index.refresh(self.gitlab, full=self.pod_index.is_empty())
+        groups = list(iter_items(self.gitlab.groups, per_page=100))
         print([group.name for group in groups])
-        groups = list(filter(lambda x: x.name not in ['FD Core', 'App', 'SE', 'iOS'], groups))
+        groups = list(filter(lambda x: x.name not in IGNORED_GROUP_NAMES, groups))
         print('过滤后', [group.name for group in groups])
-        all_urls: dict = {}
-        processed_proj_names: [str] = []
-        for group in groups:
-            projects = group.projects.list(get_all=True)
-            group_url_list = set()
-            group_threads: [MinimumTargetModifierThread] = []
-            output_queue: [queue.Queue] = queue.Queue()
-            for group_project in projects:
-                project = self.gitlab.projects.get(group_project.id, lazy=False)
-                if project.name not in processed_proj_names:
-                    thread = MinimumTargetModifierThread(proj=project, to_queue=output_queue)
-                    group_threads.append(thread)
-                    processed_proj_names.append(project.name)
-            split_arrays = list_cut(group_threads, 9)  # 数组拆分，避免开启过多线程，触发警告
-            print(f"正在处理 group: {group.name}")
-            for threads in split_arrays:
-                for thread in threads:
-                    thread.start()
-
-                for thread in threads:
-                    thread.join()
-
-                while not output_queue.empty():
-                    group_url_list.add(output_queue.get())
-            all_urls[group.name] = group_url_list
+
+        project_queue: queue.Queue = queue.Queue()
+        output_queue: queue.Queue = queue.Queue()
+        local_executor = ProcessPoolExecutor(max_workers=os.cpu_count()) if self.local else None
+        workers = [MinimumTargetModifierThread(from_queue=project_queue,
+                                               to_queue=output_queue,
+                                               journal=self.journal,
+                                               local_executor=local_executor)
+                   for _ in range(MAX_WORKER_COUNT)]
+        for worker in workers:
+            worker.start()
+
+        # 所有 group 并发枚举，project 边枚举边处理
+        enumerators = [GroupProjectsEnumerateThread(self, group=group, to_queue=project_queue) for group in groups]
+        for enumerator in enumerators:
+            enumerator.start()
+        for enumerator in enumerators:
+            enumerator.join()
+
+        for _ in workers:
+            project_queue.put(None)
+        for worker in workers:
+            worker.join()
+        if local_executor is not None:
+            local_executor.shutdown()
+
+        all_urls: dict = {group.name: set() for group in groups}
+        while not output_queue.empty():
+            group_name, url = output_queue.get()
+            all_urls[group_name].add(url)
 
         for (key, urls) in all_urls.items():
             print(f"{key} 相关组件库 merge request")
             print(urls)
 
     @classmethod
-    def modify_project(cls, project: Project) -> str:
-        # 创建分支
-        try:
-            project.branches.delete(FEATURE_BRANCH_NAME)
-        except Exception as e:
-            print(f"project {project.name} 没有分支：{FEATURE_BRANCH_NAME}")
-        else:
-            print(f"project {project.name} 删除分支 {FEATURE_BRANCH_NAME}")
-
-        try:
-            project.branches.create({'branch': FEATURE_BRANCH_NAME,
-                                     'ref': project.default_branch})
-        except Exception as e:
-            print(f"project {project.name} 无法创建分支 {FEATURE_BRANCH_NAME}，跳过这个仓库")
+    def modify_project(cls, project: Project, journal: ModifyJournal | None = None,
+                       file_paths: [str] | None = None) -> str:
+        entry: dict = journal.get(project.id) if journal is not None else {}
+        stage: str = entry.get('stage', '')
+        if stage == STAGE_MR_OPENED:
+            print(f"project {project.name} 上次已完成，跳过")
+            return entry.get('mr_url', '')
+        if stage == STAGE_FILES_COMMITTED and not entry.get('modified', False):
+            print(f"project {project.name} 上次已处理，没有需要修改的文件，跳过")
             return ''
 
-        file_items: [dict] = project.repository_tree(ref=project.default_branch, recursive=True, all=True)
-        podspec_modified = Modifier.modify_project_podspec(project=project, file_items=file_items)
-        xcodeproj_modified = Modifier.modify_project_xcodeproj(project=project, file_items=file_items)
-        podfile_modified = Modifier.modify_project_podfile(project=project, file_items=file_items)
+        if len(stage) == 0:
+            # 创建分支
+            try:
+                project.branches.delete(FEATURE_BRANCH_NAME)
+            except Exception as e:
+                print(f"project {project.name} 没有分支：{FEATURE_BRANCH_NAME}")
+            else:
+                print(f"project {project.name} 删除分支 {FEATURE_BRANCH_NAME}")
+
+            try:
+                project.branches.create({'branch': FEATURE_BRANCH_NAME,
+                                         'ref': project.default_branch})
+            except Exception as e:
+                print(f"project {project.name} 无法创建分支 {FEATURE_BRANCH_NAME}，跳过这个仓库")
+                return ''
+            if journal is not None:
+                journal.update(project, STAGE_BRANCH_CREATED)
+        else:
+            print(f"project {project.name} 从上次的进度 {stage} 继续")
+
+        if stage in ['', STAGE_BRANCH_CREATED]:
+            if file_paths is not None:
+                file_items: [dict] = [{'path': path} for path in file_paths]
+            else:
+                file_items: [dict] = project.repository_tree(ref=project.default_branch, recursive=True, all=True)
+            podspec_modified = Modifier.modify_project_podspec(project=project, file_items=file_items)
+            xcodeproj_modified = Modifier.modify_project_xcodeproj(project=project, file_items=file_items)
+            podfile_modified = Modifier.modify_project_podfile(project=project, file_items=file_items)
+            modified = podfile_modified or podspec_modified or xcodeproj_modified
+            if journal is not None:
+                journal.update(project, STAGE_FILES_COMMITTED, modified=modified)
+        else:
+            modified = entry.get('modified', False)
 
-        if podfile_modified or podspec_modified or xcodeproj_modified:
+        if modified:
             # 创建 merge request
             try:
-                mr = project.mergerequests.create({'source_branch': 'modify_minimum_target',
+                mr = project.mergerequests.create({'source_branch': FEATURE_BRANCH_NAME,
                                                    'target_branch': project.default_branch,
-                                                   'title': 'feature: 调整组件库最低支持版本至 iOS 12',
+                                                   'title': MR_TITLE,
                                                    'squash': True})
                 mr.save()
+                if journal is not None:
+                    journal.update(project, STAGE_MR_OPENED, mr_url=mr.web_url)
                 return mr.web_url
             except Exception as e:
-                mr_list = project.mergerequests.list(state='opened',
-                                                     order_by='updated_at',
-                                                     get_all=True)
-                for mr in mr_list:
-                    if mr.source_branch == FEATURE_BRANCH_NAME:
-                        print(f"project {project.name} 已有 merge request")
-                        return mr.web_url
+                mr = first_item(project.mergerequests,
+                                lambda x: x.source_branch == FEATURE_BRANCH_NAME,
+                                state='opened',
+                                order_by='updated_at',
+                                source_branch=FEATURE_BRANCH_NAME)
+                if mr is not None:
+                    print(f"project {project.name} 已有 merge request")
+                    if journal is not None:
+                        journal.update(project, STAGE_MR_OPENED, mr_url=mr.web_url)
+                    return mr.web_url
                 return ''
         return ''
 
+    @classmethod
+    def modify_project_local(cls, project: Project, journal: ModifyJournal | None, executor: Executor) -> str:
+        """
+        本地模式：浅 clone（不下载 blob）到缓存目录，只检出需要修改的文件，修改后一次 push 并通过 push option 创建 MR
+        :param project: gitlab project 实例
+        :param journal: 进度记录
+        :param executor: 修改文件使用的进程池
+        :return: merge request 链接
+        """
+        entry: dict = journal.get(project.id) if journal is not None else {}
+        if entry.get('stage', '') == STAGE_MR_OPENED:
+            print(f"project {project.name} 上次已完成，跳过")
+            return entry.get('mr_url', '')
+
+        repo_dir = os.path.join(CLONE_CACHE_DIR, project.path_with_namespace)
+        branch = project.default_branch
+        try:
+            if not os.path.exists(os.path.join(repo_dir, '.git')):
+                run_git(None, 'clone', '--quiet', '--depth', '1', '--filter=blob:none', '--no-checkout',
+                        '--branch', branch, project.ssh_url_to_repo, repo_dir)
+            else:
+                run_git(repo_dir, 'fetch', '--quiet', '--depth', '1', '--filter=blob:none', 'origin', branch)
+                run_git(repo_dir, 'reset', '--quiet', '--soft', 'FETCH_HEAD')
+            run_git(repo_dir, 'reset', '--quiet')
+
+            paths = [path for path in run_git(repo_dir, 'ls-tree', '-r', '--name-only', 'HEAD').splitlines()
+                     if get_modify_rule(path) is not None]
+            if len(paths) == 0:
+                print(f"project {project.name} 没有需要修改的文件")
+                return ''
+            # 只下载需要修改的文件
+            run_git(repo_dir, 'checkout', 'HEAD', '--', *paths)
+            results = executor.map(rewrite_local_file, [os.path.join(repo_dir, path) for path in paths])
+            changed_paths = [path for path, changed in zip(paths, results) if changed]
+            if journal is not None:
+                journal.update(project, STAGE_FILES_COMMITTED, modified=len(changed_paths) > 0)
+            if len(changed_paths) == 0:
+                print(f"project {project.name} 文件无需修改")
+                return ''
+
+            print(f"project {project.name} 修改 {', '.join(changed_paths)}")
+            run_git(repo_dir, 'add', '--', *changed_paths)
+            run_git(repo_dir, 'commit', '--quiet', '-m', COMMIT_MESSAGE)
+            output = run_git(repo_dir, 'push', '--force',
+                             '-o', 'merge_request.create',
+                             '-o', f'merge_request.target={branch}',
+                             '-o', f'merge_request.title={MR_TITLE}',
+                             'origin', f'HEAD:refs/heads/{FEATURE_BRANCH_NAME}')
+        except RuntimeError as e:
+            print(f"project {project.name} 处理失败：{e}")
+            return ''
+
+        mr_url = get_mr_url_from_push_output(output).url.strip()
+        if len(mr_url) > 0 and journal is not None:
+            journal.update(project, STAGE_MR_OPENED, mr_url=mr_url)
+        return mr_url
+
     @classmethod
     def modify_project_podspec(cls, project: Project, file_items: [dict]) -> bool:
         try:
-            items: [dict] = project.repository_tree(ref='master', recursive=True, all=True)
-            filenames = [f['path'] for f in items if ('.podspec' in f['path'])]
+            filenames = [f['path'] for f in file_items if (PODSPEC_RULE[0] in f['path'])]
             if len(filenames) == 0:
                 return False
 
             f: ProjectFile = project.files.get(file_path=filenames[0], ref=project.default_branch)
-            new_content = re.sub(rb"ios.deployment_target = [\'\"]([1-9]\d?(\.([1-9]?\d)))[\'\"]",
-                                 b'ios.deployment_target = \'12.0\'',
-                                 f.decode())
+            new_content = re.sub(PODSPEC_RULE[1], PODSPEC_RULE[2], f.decode())
             f.content = new_content.decode('utf-8')  # 字节转字符串
-            f.save(branch=FEATURE_BRANCH_NAME, commit_message='feature: 调整组件库最低支持版本至 iOS 12')
+            f.save(branch=FEATURE_BRANCH_NAME, commit_message=COMMIT_MESSAGE)
             return True
         except Exception as e:
             print(e)
@@ -160,7 +436,7 @@ class Modifier:
     @classmethod
     def modify_project_xcodeproj(cls, project: Project, file_items: [dict]) -> bool:
         try:
-            filenames = [f['path'] for f in file_items if ('.pbxproj' in f['path'])]
+            filenames = [f['path'] for f in file_items if (XCODEPROJ_RULE[0] in f['path'])]
             if len(filenames) == 0:
                 print(f"project {project.name} 没有找到 pbxproj 格式文件")
                 return False
@@ -168,11 +444,9 @@ class Modifier:
             for file in filenames:
                 print(f"project {project.name} 修改 {file} 文件中")
                 f: ProjectFile = project.files.get(file_path=file, ref=project.default_branch)
-                new_content = re.sub(rb"IPHONEOS_DEPLOYMENT_TARGET = ([1-9]\d?(\.([1-9]?\d)));",
-                                     b'IPHONEOS_DEPLOYMENT_TARGET = 12.0;',
-                                     f.decode())
+                new_content = re.sub(XCODEPROJ_RULE[1], XCODEPROJ_RULE[2], f.decode())
                 f.content = new_content.decode('utf-8')  # 字节转字符串
-                f.save(branch=FEATURE_BRANCH_NAME, commit_message='feature: 调整组件库最低支持版本至 iOS 12')
+                f.save(branch=FEATURE_BRANCH_NAME, commit_message=COMMIT_MESSAGE)
             return True
         except Exception as e:
             print(e)
@@ -181,7 +455,7 @@ class Modifier:
     @classmethod
     def modify_project_podfile(cls, project: Project, file_items: [dict]) -> bool:
         try:
-            filenames = [f['path'] for f in file_items if ('Podfile' in f['path'])]
+            filenames = [f['path'] for f in file_items if (PODFILE_RULE[0] in f['path'])]
             if len(filenames) == 0:
                 print(f"project {project.name} 没有找到 Podfile 文件")
                 return False
@@ -189,11 +463,9 @@ class Modifier:
             for file in filenames:
                 print(f"project {project.name} 修改 {file} 文件中")
                 f: ProjectFile = project.files.get(file_path=file, ref=project.default_branch)
-                new_content = re.sub(rb"platform :ios, [\'\"]([1-9]\d?(\.([1-9]?\d)))[\'\"]",
-                                     b'platform :ios, \'12.0\'',
-                                     f.decode())
+                new_content = re.sub(PODFILE_RULE[1], PODFILE_RULE[2], f.decode())
                 f.content = new_content.decode('utf-8')  # 字节转字符串
-                f.save(branch=FEATURE_BRANCH_NAME, commit_message='feature: 调整组件库最低支持版本至 iOS 12')
+                f.save(branch=FEATURE_BRANCH_NAME, commit_message=COMMIT_MESSAGE)
             return True
         except Exception as e:
             print(e)
@@ -201,5 +473,10 @@ class Modifier:
 
 
 if __name__ == '__main__':
-    modifier = Modifier()
+    # --restart 忽略上次的进度记录，所有 project 重新处理
+    # --local 本地 clone 模式
+    # --index 使用 pod 依赖索引选择需要修改的仓库
+    modifier = Modifier(restart='--restart' in sys.argv,
+                        local='--local' in sys.argv,
+                        use_index='--index' in sys.argv)
     modifier.start()